@@ -0,0 +1,307 @@
+"""Scan history: the findings of every recorded scan in a local SQLite database.
+
+Besides the raw findings (indexed by rule, file, directory and time) each scan stores a
+rollup row per directory with the severity counts of that directory's whole subtree. The
+rollups are written once, when the scan is recorded, so the score of any subtree at any
+past scan is a primary-key lookup and a trend is one index range scan; reading them never
+aggregates findings.
+"""
+import datetime
+import html
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from scanner import DEFAULT_CACHE_DIR, SEVERITY_ORDER, Baseline, Issue, ScannerEngine, health_score
+
+DEFAULT_HISTORY = DEFAULT_CACHE_DIR / "history.sqlite"
+ROLLUP_COUNTS = ("critical", "high", "medium", "low", "files")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    started REAL NOT NULL,
+    ruleset TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scans_root_started ON scans (root, started);
+
+CREATE TABLE IF NOT EXISTS paths (
+    id INTEGER PRIMARY KEY,
+    root TEXT NOT NULL,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    UNIQUE (root, path)
+);
+CREATE INDEX IF NOT EXISTS paths_root_dir ON paths (root, dir);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    severity TEXT NOT NULL,
+    category TEXT NOT NULL,
+    rule_id TEXT NOT NULL,
+    message TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    UNIQUE (rule_id, severity, category, message, suggestion)
+);
+
+CREATE TABLE IF NOT EXISTS findings (
+    scan_id INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    path_id INTEGER NOT NULL REFERENCES paths (id),
+    message_id INTEGER NOT NULL REFERENCES messages (id),
+    rule_id TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS findings_scan ON findings (scan_id);
+CREATE INDEX IF NOT EXISTS findings_rule ON findings (rule_id, scan_id);
+CREATE INDEX IF NOT EXISTS findings_path ON findings (path_id, scan_id);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    root TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    started REAL NOT NULL,
+    scan_id INTEGER NOT NULL REFERENCES scans (id) ON DELETE CASCADE,
+    critical INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    medium INTEGER NOT NULL,
+    low INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    PRIMARY KEY (root, dir, started, scan_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rollups_scan ON rollups (scan_id, dir);
+"""
+
+
+def parse_when(text: str, end_of_day: bool = True) -> float:
+    """'2026-03-01' or '2026-03-01T12:00' (local time) -> timestamp; a bare date means its last second."""
+    moment = datetime.datetime.fromisoformat(text.strip())
+    if end_of_day and len(text.strip()) == 10:
+        moment += datetime.timedelta(days=1, microseconds=-1)
+    return moment.timestamp()
+
+
+def _parent(rel_path: str) -> Optional[str]:
+    """Directory of a root-relative path ('' for the root itself, None above it)."""
+    return None if not rel_path else rel_path.rpartition("/")[0]
+
+
+def _point(row) -> dict:
+    counts = dict(zip(ROLLUP_COUNTS, row[2:]))
+    return dict(scan=row[0], started=row[1], **counts, score=health_score(counts))
+
+
+class HistoryStore:
+    """Recorded scans of any number of roots (absolute paths) in one SQLite file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or DEFAULT_HISTORY)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL")
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self._redact_old_findings()
+        self.db.executescript(SCHEMA)
+
+    def _redact_old_findings(self):
+        """Databases written before findings were fingerprinted held the raw line (secrets included): wipe it."""
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(findings)")]
+        if "content" not in columns:
+            return
+        with self.db:
+            self.db.execute("ALTER TABLE findings RENAME COLUMN content TO fingerprint")
+            self.db.execute("UPDATE findings SET fingerprint = ''")
+        self.db.execute("VACUUM")  # also drops the old text from free pages
+        self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def root_of(scan: ScannerEngine) -> str:
+        return os.path.realpath(scan.root_path)
+
+    def record(self, scan: ScannerEngine, started: Optional[float] = None) -> int:
+        """Stores the findings of `scan` and the subtree rollups of every directory it touched.
+
+        A finding's source line is never stored (it may hold the very secret that was found),
+        only its Baseline fingerprint.
+        """
+        root = self.root_of(scan)
+        started = time.time() if started is None else started
+        rel = {}
+        for filepath in list(scan.scanned) + scan.issues.files():
+            if filepath not in rel:
+                rel[filepath] = scan.issues.rel(filepath).replace(os.sep, "/")
+
+        rollups: Dict[str, List[int]] = {}
+        columns = {sev: idx for idx, sev in enumerate(ROLLUP_COUNTS[:4])}
+
+        def bump(rel_path: str, column: int, n: int = 1):
+            directory = _parent(rel_path)
+            while directory is not None:
+                rollups.setdefault(directory, [0] * len(ROLLUP_COUNTS))[column] += n
+                directory = _parent(directory)
+
+        for filepath in scan.scanned:
+            bump(rel[filepath], ROLLUP_COUNTS.index("files"))
+        for filepath in scan.issues.files():
+            for issue in scan.issues.for_file(filepath):
+                column = columns.get(issue.severity.lower())
+                if column is not None:
+                    bump(rel[filepath], column)
+
+        with self.db:
+            scan_id = self.db.execute("INSERT INTO scans (root, started, ruleset) VALUES (?, ?, ?)",
+                                      (root, started, scan.rules.version)).lastrowid
+            self.db.executemany("INSERT OR IGNORE INTO paths (root, path, dir) VALUES (?, ?, ?)",
+                                ((root, p, _parent(p)) for p in set(rel.values())))
+            ids = dict(self.db.execute("SELECT path, id FROM paths WHERE root = ?", (root,)))
+            kinds = {(i.severity, i.category, i.rule_id, i.message, i.suggestion) for i in scan.issues}
+            self.db.executemany("INSERT OR IGNORE INTO messages (severity, category, rule_id, message, suggestion) "
+                                "VALUES (?, ?, ?, ?, ?)", kinds)
+            messages = {row[1:]: row[0] for row in self.db.execute(
+                "SELECT id, severity, category, rule_id, message, suggestion FROM messages")}
+            self.db.executemany(
+                "INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?)",
+                ((scan_id, ids[rel[i.filepath]], messages[i.severity, i.category, i.rule_id, i.message, i.suggestion],
+                  i.rule_id, i.line_num, Baseline.fingerprint(i, rel[i.filepath])) for i in scan.issues))
+            self.db.executemany("INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                ((root, directory, started, scan_id, *counts)
+                                 for directory, counts in rollups.items()))
+        return scan_id
+
+    def scans(self, root: str, since: Optional[float] = None, until: Optional[float] = None) -> List[dict]:
+        rows = self.db.execute("SELECT id, started, ruleset FROM scans WHERE root = ? AND started BETWEEN ? AND ? "
+                               "ORDER BY started, id", (root, since or 0.0, until or float("inf")))
+        return [{"scan": scan_id, "started": started, "ruleset": ruleset} for scan_id, started, ruleset in rows]
+
+    def scan_at(self, root: str, when: Optional[float] = None) -> Optional[int]:
+        """Id of the last scan of `root` recorded at or before `when` (default: the latest)."""
+        row = self.db.execute("SELECT id FROM scans WHERE root = ? AND started <= ? ORDER BY started DESC, id DESC "
+                              "LIMIT 1", (root, float("inf") if when is None else when)).fetchone()
+        return row and row[0]
+
+    def trend(self, root: str, directory: str = "", since: Optional[float] = None,
+              until: Optional[float] = None) -> List[dict]:
+        """Severity counts, file count and score of one subtree for every scan in the window, oldest first."""
+        rows = self.db.execute(
+            "SELECT scan_id, started, critical, high, medium, low, files FROM rollups "
+            "WHERE root = ? AND dir = ? AND started BETWEEN ? AND ? ORDER BY started, scan_id",
+            (root, directory.strip("/"), since or 0.0, until or float("inf")))
+        return [_point(row) for row in rows]
+
+    def rollup(self, root: str, directory: str = "", scan_id: Optional[int] = None) -> Optional[dict]:
+        """One subtree at one scan (default: the latest); None if the subtree had no files then."""
+        scan_id = scan_id or self.scan_at(root)
+        row = self.db.execute(
+            "SELECT r.scan_id, r.started, critical, high, medium, low, files FROM scans s JOIN rollups r "
+            "ON r.root = s.root AND r.dir = ? AND r.started = s.started AND r.scan_id = s.id WHERE s.id = ?",
+            (directory.strip("/"), scan_id)).fetchone()
+        return row and _point(row)
+
+    def children(self, root: str, directory: str = "", scan_id: Optional[int] = None) -> Dict[str, dict]:
+        """Rollups of the direct subdirectories of `directory` at one scan (default: the latest)."""
+        scan_id = scan_id or self.scan_at(root)
+        directory = directory.strip("/")
+        prefix = directory + "/" if directory else ""
+        rows = self.db.execute(
+            "SELECT dir, scan_id, started, critical, high, medium, low, files FROM rollups "
+            "WHERE scan_id = ? AND dir > ? AND dir < ?", (scan_id, prefix, prefix + "\U0010ffff"))
+        return {row[0]: _point(row[1:]) for row in rows if "/" not in row[0][len(prefix):]}
+
+    def findings(self, root: str, scan_id: Optional[int] = None, rule_id: Optional[str] = None,
+                 path: Optional[str] = None, directory: Optional[str] = None) -> List[Issue]:
+        """Findings of one scan (default: the latest), optionally for one rule, file or subtree.
+
+        The source line is not recorded, so each Issue's `content` is its fingerprint instead.
+        """
+        scan_id = scan_id or self.scan_at(root)
+        sql = ("SELECT m.severity, m.category, p.path, f.line, f.fingerprint, m.message, m.suggestion, f.rule_id "
+               "FROM findings f JOIN paths p ON p.id = f.path_id JOIN messages m ON m.id = f.message_id "
+               "WHERE f.scan_id = ?")
+        args: list = [scan_id]
+        if rule_id:
+            sql += " AND f.rule_id = ?"
+            args.append(rule_id)
+        if path:
+            sql += " AND p.root = ? AND p.path = ?"
+            args += [root, path.strip("/")]
+        if directory:
+            sql += " AND p.root = ? AND (p.dir = ? OR p.dir BETWEEN ? AND ?)"
+            directory = directory.strip("/")
+            args += [root, directory, directory + "/", directory + "/\U0010ffff"]
+        rows = self.db.execute(sql, args).fetchall()
+        rows.sort(key=lambda r: (SEVERITY_ORDER.get(r[0], 99), r[2], r[3]))
+        return [Issue(*row) for row in rows]
+
+
+# --- TREND CHARTS (HTML export) ---
+
+CHART_WIDTH, CHART_HEIGHT = 560, 160
+SEVERITY_COLORS = {"critical": "#dc3545", "high": "#fd7e14", "medium": "#ffc107", "low": "#0dcaf0"}
+
+
+def _polyline(values: List[float], top: float, width: int, height: int, color: str, stroke: int = 2) -> str:
+    step = width / max(1, len(values) - 1)
+    points = " ".join(f"{i * step:.1f},{height - (v / top if top else 0) * height:.1f}" for i, v in enumerate(values))
+    return f'<polyline fill="none" stroke="{color}" stroke-width="{stroke}" points="{points}"/>'
+
+
+def _chart(title: str, series: Dict[str, List[float]], colors: Dict[str, str], top: float, first: str,
+           last: str) -> str:
+    lines = "".join(_polyline(values, top, CHART_WIDTH, CHART_HEIGHT, colors[name]) for name, values in series.items())
+    legend = " ".join(f'<span style="color:{colors[name]}">&#9632; {html.escape(name)}</span>' for name in series)
+    return f"""
+        <div class="chart">
+            <div class="chart-title">{html.escape(title)} <span class="legend">{legend}</span></div>
+            <svg viewBox="-4 -4 {CHART_WIDTH + 8} {CHART_HEIGHT + 8}" preserveAspectRatio="none">
+                <line x1="0" y1="{CHART_HEIGHT}" x2="{CHART_WIDTH}" y2="{CHART_HEIGHT}" stroke="#444"/>{lines}
+            </svg>
+            <div class="chart-axis"><span>{first}</span><span>max {top:g}</span><span>{last}</span></div>
+        </div>"""
+
+
+def _day(ts: float) -> str:
+    return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d")
+
+
+def trend_html(store: HistoryStore, root: str, since: Optional[float] = None, max_dirs: int = 12) -> str:
+    """Inline SVG charts (score and findings per severity over time, worst subdirectories) for the HTML report.
+
+    Reads rollups only. Empty if `root` has fewer than two recorded scans.
+    """
+    points = store.trend(root, "", since)
+    if len(points) < 2:
+        return ""
+    first, last = _day(points[0]["started"]), _day(points[-1]["started"])
+    out = [_chart("Health score", {"score": [p["score"] for p in points]}, {"score": "#28a745"}, 100, first, last)]
+    severities = {sev: [p[sev] for p in points] for sev in SEVERITY_COLORS}
+    top = max(max(values) for values in severities.values()) or 1
+    out.append(_chart("Findings by severity", severities, SEVERITY_COLORS, top, first, last))
+
+    latest = store.children(root, "", points[-1]["scan"])
+    worst = sorted(latest.items(), key=lambda kv: (kv[1]["score"], kv[0]))[:max_dirs]
+    rows = []
+    for directory, now in worst:
+        scores = [p["score"] for p in store.trend(root, directory, since)]
+        change = now["score"] - scores[0]
+        spark = f'<svg class="spark" viewBox="-2 -2 124 28" preserveAspectRatio="none">' \
+                f'{_polyline(scores, 100, 120, 24, "#00bcd4", 1)}</svg>' if len(scores) > 1 else ""
+        rows.append(f"<tr><td class=\"location\">{html.escape(directory)}/</td><td>{now['score']}</td>"
+                    f"<td>{change:+d}</td><td>{now['critical']} / {now['high']} / {now['medium']} / {now['low']}</td>"
+                    f"<td>{spark}</td></tr>")
+    if rows:
+        out.append('\n        <table class="trend-table"><thead><tr><th>Directory</th><th>Score</th>'
+                   f'<th>Since {first}</th><th>Crit / High / Med / Low</th><th>Trend</th></tr></thead>'
+                   f'<tbody>{"".join(rows)}</tbody></table>')
+    return f'\n        <div class="trends">{"".join(out)}\n        </div>\n'
@@ -1,577 +1,718 @@
-import typer
-import re
 import os
 import sys
 
 # --- CRITICAL: FORCE UTF-8 BEFORE IMPORTING ANYTHING ELSE ---
 os.environ["PYTHONIOENCODING"] = "utf-8"
 sys.stdout.reconfigure(encoding='utf-8')
-if os.name == 'nt':
-    os.system('chcp 65001 >nul')
 
-import time
-import random
-import datetime
-import webbrowser
+# Pre-commit hooks run `main.py check FILE...` on every commit: answer them before Typer and
+# Rich are imported, which would otherwise dominate the runtime.
+if __name__ == "__main__" and sys.argv[1:2] == ["check"]:
+    import scanner
+    sys.exit(scanner.main(sys.argv[2:]))
+
+import typer
+import json
+import multiprocessing
+import tarfile
+import tempfile
 from pathlib import Path
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.text import Text
-from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
-from rich.tree import Tree
-from rich.layout import Layout
-from rich.align import Align
-from rich.prompt import Prompt, IntPrompt
-from rich.syntax import Syntax
-from rich import print as rprint
-from rich.live import Live
-
-# --- FIX: SMART ICON DETECTION SYSTEM ---
-# This detects if the terminal supports emojis. If not (standard .exe), it uses safe text.
-def is_modern_terminal():
-    # Check for Windows Terminal, VS Code, or PyCharm environments
-    if "WT_SESSION" in os.environ: return True
-    if os.environ.get("TERM_PROGRAM") in ["vscode", "Apple_Terminal"]: return True
-    if "PYCHARM_HOSTED" in os.environ: return True
-    return False
-
-# Setup Console based on environment
-if is_modern_terminal():
-    console = Console(force_terminal=True)
-    # Modern Emojis
-    ICON_SPIDER = "🕷️"
-    ICON_SCOPE = "🔬"
-    ICON_MAP = "🗺️"
-    ICON_FIX = "🔧"
-    ICON_CHART = "📊"
-    ICON_WHALE = "🐳"
-    ICON_OCTOPUS = "🐙"
-    ICON_PACKAGE = "📦"
-    ICON_SHIELD = "🛡️"
-    ICON_CHECK = "✔"
-    ICON_CROSS = "❌"
-else:
-    # Legacy Safe Mode (Fixes the "Square Box" issue in .exe)
-    console = Console(force_terminal=True, legacy_windows=True)
-    ICON_SPIDER = "[SCAN]"
-    ICON_SCOPE = "[ANALYZE]"
-    ICON_MAP = "[MAP]"
-    ICON_FIX = "[FIX]"
-    ICON_CHART = "[REPORT]"
-    ICON_WHALE = "[DOCKER]"
-    ICON_OCTOPUS = "[COMPOSE]"
-    ICON_PACKAGE = "[SVC]"
-    ICON_SHIELD = "[SECURITY]"
-    ICON_CHECK = "[OK]"
-    ICON_CROSS = "[ERROR]"
+from typing import List, Optional
+from scanner import (
+    DEFAULT_EXCLUDES, DEFAULT_MAX_FILE_SIZE, READ_AHEAD, RULESET_VERSION, SEVERITY_ORDER, REPORT_FORMATS,
+    Baseline, Issue, IssueStreamWriter, PartialMerge, Profiler, ProjectGraph, ResultCache, RuleSet, ScannerEngine,
+    SpiderWalker, WatchSession, _span, exceeds_threshold, generate_corpus, git_changed_files, is_archive,
+    apply_fix, parse_shard, plan_fixes, reanalyze_fixed, report_format, run_benchmark, shard_of, unified_diff,
+    write_issue_report, write_partial, write_report,
+)
 
 app = typer.Typer()
 
-BANNER = """
-[bold cyan]
-██████╗  ██████╗  ██████╗██╗  ██╗███████╗██████╗ 
-██╔══██╗██╔═══██╗██╔════╝██║ ██╔╝██╔════╝██╔══██╗
-██║  ██║██║   ██║██║     █████╔╝ █████╗  ██████╔╝
-██║  ██║██║   ██║██║     ██╔═██╗ ██╔══╝  ██╔══██╗
-██████╔╝╚██████╔╝╚██████╗██║  ██╗███████╗██║  ██║
-╚═════╝  ╚═════╝  ╚═════╝╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝
-[/bold cyan][bold white]       THE ARCHITECT'S CONSOLE v3.2 (FIXED EDITION)
-       "Because Security is not a Feature, it's a State."
-[/bold white]"""
-
-
-@dataclass
-class Issue:
-    severity: str  # CRITICAL, HIGH, MEDIUM, LOW
-    category: str  # SECURITY, PERFORMANCE, BEST_PRACTICE
-    filepath: str
-    line_num: int
-    content: str
-    message: str
-    suggestion: str
-
-
-class ScannerEngine:
-    def __init__(self):
-        self.issues: List[Issue] = []
-        self.dockerfiles: List[Path] = []
-        self.composefiles: List[Path] = []
-        self.root_path = Path(".")
-        self.stats = {
-            "critical": 0,
-            "high": 0,
-            "medium": 0,
-            "low": 0,
-            "files_scanned": 0
-        }
-
-    def reset(self):
-        self.issues = []
-        self.dockerfiles = []
-        self.composefiles = []
-        self.stats = {k: 0 for k in self.stats}
-
-    def spider_search(self, start_path: str):
-        """Recursively finds all Docker infrastructure files."""
-        self.root_path = Path(start_path)
-        self.reset()
-
-        try:
-            for root, dirs, files in os.walk(start_path):
-                # Skip common ignore folders
-                if any(x in root for x in [".git", "node_modules", "venv", "__pycache__"]):
-                    continue
 
-                for file in files:
-                    if file == "Dockerfile" or file.endswith(".Dockerfile"):
-                        self.dockerfiles.append(Path(root) / file)
-                    elif file in ["docker-compose.yml", "docker-compose.yaml"]:
-                        self.composefiles.append(Path(root) / file)
-        except PermissionError:
-            rprint("[red]Permission Denied: Could not access some folders.[/red]")
-
-    def analyze_all(self):
-        """Runs the deep scan on all found files."""
-        for df in self.dockerfiles:
-            self._scan_dockerfile(df)
-        for cf in self.composefiles:
-            self._scan_compose(cf)
-
-    def add_issue(self, severity, category, filepath, line, content, msg, fix):
-        self.issues.append(Issue(severity, category, str(filepath), line, content, msg, fix))
-        if severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
-            self.stats[severity.lower()] += 1
-
-    def _scan_dockerfile(self, filepath: Path):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-        except:
-            return
-
-        self.stats["files_scanned"] += 1
-        has_user = False
-        has_healthcheck = False
-
-        for i, line in enumerate(lines):
-            line_num = i + 1
-            content = line.strip()
-            if not content or content.startswith("#"): continue
-
-            # --- SECURITY ---
-            if "USER" in content.upper(): has_user = True
-            if "HEALTHCHECK" in content.upper(): has_healthcheck = True
-
-            if "sudo" in content.lower():
-                self.add_issue("CRITICAL", "SECURITY", filepath, line_num, content, "Sudo used in build.",
-                               "Remove 'sudo'. Build as root, drop privileges later.")
-
-            if "apk add" in content and "--no-cache" not in content:
-                self.add_issue("MEDIUM", "PERFORMANCE", filepath, line_num, content, "APK Cache not disabled.",
-                               "Use 'apk add --no-cache ...' to reduce image size.")
-
-            if (
-                    "apt-get install" in content or "apt install" in content) and "rm -rf /var/lib/apt/lists" not in content:
-                self.add_issue("MEDIUM", "PERFORMANCE", filepath, line_num, content, "APT Lists not cleaned.",
-                               "Add '&& rm -rf /var/lib/apt/lists/*' to the same RUN command.")
-
-            if "pip install" in content and "--no-cache-dir" not in content:
-                self.add_issue("LOW", "PERFORMANCE", filepath, line_num, content, "Pip cache stored.",
-                               "Use 'pip install --no-cache-dir' to save space.")
-
-            if "EXPOSE 22" in content.upper():
-                self.add_issue("CRITICAL", "SECURITY", filepath, line_num, content, "SSH Port Exposed.",
-                               "Do not run SSH in containers. Use 'docker exec'.")
-
-            # Secrets Detection
-            if any(x in content.upper() for x in ["AWS_ACCESS_KEY", "SECRET_KEY", "PASSWORD="]):
-                if "ARG" not in content and "ENV" in content:
-                    self.add_issue("CRITICAL", "SECURITY", filepath, line_num, content, "Potential Hardcoded Secret.",
-                                   "Use Docker Secrets or run-time ENVs.")
-
-        if not has_user:
-            self.add_issue("HIGH", "SECURITY", filepath, 0, "Global", "Running as Root.",
-                           "Add 'USER <uid>' instruction.")
-        if not has_healthcheck:
-            self.add_issue("LOW", "BEST_PRACTICE", filepath, 0, "Global", "No Healthcheck.",
-                           "Add HEALTHCHECK instruction for auto-recovery.")
-
-    def _scan_compose(self, filepath: Path):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-        except:
-            return
+def _make_walker(exclude: List[str], threads: int, no_ignore_files: bool) -> SpiderWalker:
+    return SpiderWalker(excludes=DEFAULT_EXCLUDES + tuple(exclude), use_ignore_files=not no_ignore_files,
+                        threads=threads)
 
-        self.stats["files_scanned"] += 1
 
-        for i, line in enumerate(lines):
-            line_num = i + 1
-            content = line.strip()
-            if not content or content.startswith("#"): continue
+@app.callback(invoke_without_command=True)
+def cli(
+        ctx: typer.Context,
+        history: bool = typer.Option(False, "--history", help="Interactive menu: record each Deep Analysis in "
+                                                              "the scan history."),
+        history_db: Optional[Path] = typer.Option(None, "--history-db", help="Scan history database (SQLite)."),
+):
+    """The Architect's Console. Run without a command for the interactive menu."""
+    if ctx.invoked_subcommand is None:
+        from history import DEFAULT_HISTORY
+        from ui import main_menu
+        main_menu(history=(history_db or DEFAULT_HISTORY) if history else None)
 
-            if "/var/run/docker.sock" in content:
-                self.add_issue("CRITICAL", "SECURITY", filepath, line_num, content, "Docker Socket Mounted.",
-                               "This allows the container to delete all other containers. Avoid if possible.")
 
-            if "privileged: true" in content:
-                self.add_issue("CRITICAL", "SECURITY", filepath, line_num, content, "Privileged Mode.",
-                               "Container has full host root capabilities. Extremely dangerous.")
+def _check_source(path: str) -> bool:
+    """Validates a scan PATH; True if it is a tar archive rather than a directory."""
+    if os.path.isdir(path):
+        return False
+    if os.path.isfile(path) and is_archive(path):
+        return True
+    raise typer.BadParameter(f"'{path}' is not a directory or a tar archive", param_hint="PATH")
 
-            if "image:" in content and ":latest" in content:
-                self.add_issue("HIGH", "RELIABILITY", filepath, line_num, content, "Using :latest tag.",
-                               "Pin specific versions for production stability.")
-
-            if "environment:" in content and "PASSWORD" in lines[min(i + 1, len(lines) - 1)].upper():
-                self.add_issue("HIGH", "SECURITY", filepath, line_num, content, "Inline Environment Secrets.",
-                               "Use an .env file or Docker Secrets.")
 
+def _scan_archive(scan: ScannerEngine, path: str):
+    try:
+        scan.scan_archive(path)
+    except (tarfile.TarError, OSError, EOFError) as e:
+        sys.stderr.write(f"error: cannot read archive {path}: {e}\n")
+        raise typer.Exit(code=2)
 
-# --- UI COMPONENTS ---
 
-engine = ScannerEngine()
+def _git_changes(repo: str, rev_range: str):
+    if not os.path.isdir(repo):
+        raise typer.BadParameter(f"'{repo}' is not a git repository", param_hint="PATH")
+    try:
+        return git_changed_files(repo, rev_range)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--git-range")
+    except OSError as e:
+        sys.stderr.write(f"error: cannot run git: {e}\n")
+        raise typer.Exit(code=2)
 
 
-def print_banner():
-    if os.name == 'nt':
-        os.system('cls')
-    else:
-        console.clear()
-
-    console.print(BANNER)
-    console.print(Text("  Ahmed Atef Elnadi | DevOps Solution Architect | GitHub: AhmedDev374", style="dim white",
-                       justify="center"))
-    console.print(Text("-" * 80, style="dim blue", justify="center"))
+def _open_history(db: Optional[Path]):
+    import sqlite3
+    from history import HistoryStore
 
+    try:
+        return HistoryStore(db)
+    except (sqlite3.Error, OSError) as e:
+        sys.stderr.write(f"error: cannot open the scan history: {e}\n")
+        raise typer.Exit(code=2)
 
-def loading_animation(task_name):
-    with Progress(
-            SpinnerColumn("aesthetic"),
-            TextColumn("[bold green]{task.description}"),
-            BarColumn(bar_width=None),
-            transient=True
-    ) as progress:
-        task = progress.add_task(task_name, total=100)
-        while not progress.finished:
-            progress.update(task, advance=random.uniform(1, 5))
-            time.sleep(0.02)
 
+def _report_skipped(scan: ScannerEngine):
+    for path, failure in scan.skipped.items():
+        detail = f" ({failure.detail})" if failure.detail else ""
+        sys.stderr.write(f"not analyzed: {scan.issues.rel(path)}: {failure.reason}{detail}\n")
 
-def module_spider_scan():
-    print_banner()
-    path_input = Prompt.ask("[bold yellow][?] Enter root path to scan[/bold yellow]", default=".")
 
-    loading_animation(f"Spidering directory: {path_input}")
-    engine.spider_search(path_input)
+def _profile_tables(profiler: Profiler) -> list:
+    from rich.table import Table
 
-    tree = Tree(f"📁 [bold]{Path(path_input).resolve().name}[/bold]")
+    summary = profiler.summary()
+    stages = Table(title="Pipeline stages", header_style="bold")
+    for col in ("Stage", "Seconds", "Calls"):
+        stages.add_column(col, justify="left" if col == "Stage" else "right")
+    for name, st in summary["stages"].items():
+        stages.add_row(name, f"{st['seconds']:.4f}", str(st["calls"]))
 
-    # Visualizing the found files
-    for d in engine.dockerfiles:
-        tree.add(f"{ICON_WHALE} [cyan]{d.relative_to(path_input)}[/cyan]")
-    for c in engine.composefiles:
-        tree.add(f"{ICON_OCTOPUS} [magenta]{c.relative_to(path_input)}[/magenta]")
+    rules = Table(title="Rules (condition evaluation after trigger match)", header_style="bold")
+    for col in ("Rule", "Seconds", "Evaluations", "Hits"):
+        rules.add_column(col, justify="left" if col == "Rule" else "right")
+    for rule_id, st in summary["rules"].items():
+        rules.add_row(rule_id, f"{st['seconds']:.4f}", str(st["evaluations"]), str(st["hits"]))
 
-    console.print(Panel(tree, title="[bold]Reconnaissance Results[/bold]", border_style="blue"))
-    rprint(
-        f"[bold green]Found {len(engine.dockerfiles)} Dockerfiles and {len(engine.composefiles)} Compose files.[/bold green]")
-    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+    files = Table(title=f"Slowest {profiler.top} files", header_style="bold")
+    files.add_column("File")
+    files.add_column("Seconds", justify="right")
+    for item in summary["slowest_files"]:
+        files.add_row(item["file"], f"{item['seconds']:.4f}")
+    return [stages, rules, files]
 
 
-def module_deep_analysis():
-    if engine.stats["files_scanned"] == 0 and not engine.dockerfiles and not engine.composefiles:
-        rprint(f"[bold red]{ICON_CROSS} No files loaded! Run the Spider Scan (Option 1) first.[/bold red]")
-        time.sleep(2)
+def _finish_profile(scan: ScannerEngine, show: bool, out: Optional[Path]):
+    profiler, scan.profiler = scan.profiler, None
+    if profiler is None:
         return
-
-    print_banner()
-    loading_animation("Running Heuristic Analysis & Forensics Engine...")
-    engine.analyze_all()
-
-    # Sort issues by severity
-    severity_order = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "INFO": 4}
-    sorted_issues = sorted(engine.issues, key=lambda x: severity_order.get(x.severity, 99))
-
-    table = Table(title=f"{ICON_SHIELD} VULNERABILITY REPORT", expand=True, header_style="bold black on white")
-    table.add_column("Sev", style="bold", width=8)
-    table.add_column("File", style="dim", width=25)
-    table.add_column("Issue Detected", style="white")
-    table.add_column("Expert Solution", style="green")
-
-    for issue in sorted_issues:
-        color = "red" if issue.severity == "CRITICAL" else "yellow" if issue.severity == "HIGH" else "blue"
-
-        # FIX: Display path relative to root
+    if show:
+        from rich.console import Console
+        err = Console(stderr=True)
+        for table in _profile_tables(profiler):
+            err.print(table)
+        if scan.stats["cache_hits"]:
+            err.print(f"[dim]{scan.stats['cache_hits']} files came from the result cache; "
+                      f"use --no-cache to profile every file.[/]")
+    if out:
+        profiler.save(out)
+
+
+@app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def check(ctx: typer.Context):
+    """Fast check of individual files for pre-commit hooks (see `main.py check --help`)."""
+    import scanner
+    raise typer.Exit(code=scanner.main(ctx.args))
+
+
+@app.command()
+def scan(
+        path: str = typer.Argument(".", help="Root path to scan, or a .tar / .tar.gz archive."),
+        fmt: str = typer.Option("json", "--format", "-f", help="Output format: json, ndjson or sarif."),
+        git_range: Optional[str] = typer.Option(None, "--git-range", help="Only scan the Dockerfiles / compose files "
+                                                                          "changed in BASE..HEAD (or one commit) of "
+                                                                          "the git repository at PATH, read without "
+                                                                          "a checkout (bare repositories work)."),
+        fail_on: str = typer.Option("HIGH", "--fail-on", help="Exit 1 if any finding is at or above this severity "
+                                                             "(CRITICAL, HIGH, MEDIUM, LOW) or NONE to never fail."),
+        jobs: int = typer.Option(1, "--jobs", "-j", help="Parallel workers for analysis (0 = one per CPU)."),
+        executor: str = typer.Option("process", "--executor", help="Worker type for --jobs: process or thread."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="Extra directory names/globs to skip (repeatable)."),
+        walk_threads: int = typer.Option(1, "--walk-threads", help="Threads used to list directories."),
+        no_ignore_files: bool = typer.Option(False, "--no-ignore-files", help="Do not read .gitignore files."),
+        rules: Optional[Path] = typer.Option(None, "--rules", help="JSON file with additional custom rules."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Re-analyze every file and leave the result cache alone."),
+        cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Result cache location."),
+        baseline: Optional[Path] = typer.Option(None, "--baseline", help="Only report findings that are not in this "
+                                                                         "baseline, plus the ones that were fixed."),
+        save_baseline: Optional[Path] = typer.Option(None, "--save-baseline", help="Store this scan as a baseline."),
+        profile: bool = typer.Option(False, "--profile", help="Print stage, rule and slowest-file timings to stderr."),
+        profile_out: Optional[Path] = typer.Option(None, "--profile-out", help="Write the profile as a Chrome trace "
+                                                                              "(JSON, includes the summary)."),
+        max_file_size: int = typer.Option(DEFAULT_MAX_FILE_SIZE, "--max-file-size", help="Skip files larger than this "
+                                                                                         "many bytes (0 = no limit)."),
+        read_ahead: int = typer.Option(READ_AHEAD, "--read-ahead", help="Files read concurrently ahead of a serial "
+                                                                        "analysis (0 = read inline)."),
+        shard: Optional[str] = typer.Option(None, "--shard", help="Only analyze shard i/N of the files (split by "
+                                                                  "path hash), e.g. 2/4 on the second of four nodes."),
+        partial: Optional[Path] = typer.Option(None, "--partial", help="Also write a partial result for `merge` "
+                                                                       "(.gz to compress)."),
+        history: bool = typer.Option(False, "--history", help="Record this scan in the scan history (see `history`)."),
+        history_db: Optional[Path] = typer.Option(None, "--history-db", help="Scan history database (SQLite)."),
+):
+    """Non-interactive scan that streams findings to stdout (for CI)."""
+    engine = ScannerEngine()
+    fmt = fmt.lower()
+    fail_on = fail_on.upper()
+    if fmt not in IssueStreamWriter.FORMATS:
+        raise typer.BadParameter(f"must be one of {', '.join(IssueStreamWriter.FORMATS)}", param_hint="--format")
+    if fail_on != "NONE" and fail_on not in SEVERITY_ORDER:
+        raise typer.BadParameter("must be CRITICAL, HIGH, MEDIUM, LOW or NONE", param_hint="--fail-on")
+    if executor not in ("process", "thread"):
+        raise typer.BadParameter("must be process or thread", param_hint="--executor")
+    changes = _git_changes(path, git_range) if git_range else None
+    archive = changes is None and _check_source(path)
+    try:
+        shard_spec = parse_shard(shard) if shard else (1, 1)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--shard")
+    if shard and archive:
+        raise typer.BadParameter("archives are read in one pass and cannot be sharded", param_hint="--shard")
+    if history and shard:
+        raise typer.BadParameter("a single shard cannot be recorded in the history", param_hint="--history")
+    if changes is not None and shard:
+        changes = changes[0], [p for p in changes[1] if shard_of(p, shard_spec[1]) == shard_spec[0]]
+
+    if rules:
         try:
-            rel_path = os.path.relpath(issue.filepath, engine.root_path)
-        except ValueError:
-            rel_path = Path(issue.filepath).name
-
-        table.add_row(
-            f"[{color}]{issue.severity}[/{color}]",
-            f"{rel_path}:{issue.line_num}",
-            issue.message,
-            issue.suggestion
-        )
-
-    console.print(table)
-
-    # Scorecard
-    score = 100 - (engine.stats["critical"] * 15) - (engine.stats["high"] * 5) - (engine.stats["medium"] * 2)
-    score = max(0, score)
-
-    stats_panel = Panel(
-        f"""
-        [bold red]CRITICAL: {engine.stats['critical']}[/]   [bold yellow]HIGH: {engine.stats['high']}[/]   [bold blue]MEDIUM: {engine.stats['medium']}[/]
-
-        [bold white on blue]  FINAL SYSTEM SCORE: {score}/100  [/]
-        """,
-        title="Session Statistics", border_style="white"
-    )
-    console.print(stats_panel)
-    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
-
-
-def module_fixer_preview():
-    print_banner()
-    rprint(f"[bold yellow]{ICON_FIX} AUTO-FIX PREVIEW MODULE[/bold yellow]")
-
-    if not engine.issues:
-        rprint("[dim]No issues to fix. Run analysis first.[/dim]")
-        time.sleep(2)
-        return
-
-    for issue in engine.issues:
-        if issue.line_num > 0:
-            console.print(Panel(
-                f"[red]- {issue.content}[/red]\n[green]+ {issue.suggestion}[/green]",
-                title=f"{Path(issue.filepath).name} : Line {issue.line_num}",
-                subtitle=issue.category
-            ))
-
-    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+            engine.rules.load(rules)
+        except (OSError, ValueError, TypeError) as e:
+            raise typer.BadParameter(str(e), param_hint="--rules")
+    previous = None
+    if baseline:
+        try:
+            previous = Baseline.load(baseline)
+        except (OSError, ValueError, KeyError) as e:
+            raise typer.BadParameter(str(e), param_hint="--baseline")
+
+    engine.profiler = Profiler() if profile or profile_out else None
+    engine.max_file_size, engine.read_ahead = max_file_size, read_ahead
+    writer = IssueStreamWriter(fmt, rules=engine.rules.rules)
+    if not archive and changes is None:
+        engine.spider_search(path, _make_walker(exclude, walk_threads, no_ignore_files))
+        if shard:
+            engine.select_shard(*shard_spec)
+    engine.cache = None if no_cache else ResultCache(engine.rules.version, cache_dir)
+    gate = None  # severity counts the --fail-on threshold applies to
+    if previous is None:
+        engine.on_issue = writer.write
+    else:
+        comparison = previous.diff(lambda filepath: engine.issues.rel(filepath))
+        gate = {sev.lower(): 0 for sev in SEVERITY_ORDER}
 
+        def report_new(issue: Issue):
+            if comparison.is_new(issue):
+                gate[issue.severity.lower()] = gate.get(issue.severity.lower(), 0) + 1
+                writer.write(issue, "new")
 
-def module_topology_map():
-    print_banner()
-    rprint(f"[bold cyan]{ICON_MAP}  INFRASTRUCTURE TOPOLOGY MAP[/bold cyan]")
+        engine.on_issue = report_new
+    writer.open()
+    try:
+        if archive:
+            _scan_archive(engine, path)
+        elif changes is not None:
+            engine.scan_git(path, *changes)
+        else:
+            engine.analyze_all(jobs=jobs, executor=executor)
+    finally:
+        engine.on_issue = None
 
-    if not engine.composefiles:
-        rprint("[dim]No compose files found. Cannot map topology.[/dim]")
-        time.sleep(2)
-        return
+    with _span(engine.profiler, "report"):
+        if previous is None:
+            writer.close(engine.stats, engine.score())
+        else:
+            fixed = comparison.fixed()
+            stats = dict(engine.stats, new=comparison.new, fixed=sum(f["count"] for f in fixed))
+            writer.close(stats, engine.score(), fixed)
+    if save_baseline:
+        Baseline.from_issues(engine.issues).save(save_baseline)
+    if partial:
+        write_partial(engine, partial, shard_spec)
+    if history:
+        with _open_history(history_db) as store:
+            store.record(engine)
+    _report_skipped(engine)
+    _finish_profile(engine, profile, profile_out)
+
+    if fail_on != "NONE" and exceeds_threshold(engine.stats if gate is None else gate, fail_on):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def export(
+        path: str = typer.Argument(".", help="Root path to scan, or a .tar / .tar.gz archive."),
+        output: str = typer.Option("audit_report.html", "--output", "-o", help="Report file (.html, .jsonl or .csv)."),
+        fmt: Optional[str] = typer.Option(None, "--format", "-f", help="html, jsonl or csv (default: from extension)."),
+        jobs: int = typer.Option(1, "--jobs", "-j", help="Parallel workers for analysis (0 = one per CPU)."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Re-analyze every file and leave the result cache alone."),
+        profile: bool = typer.Option(False, "--profile", help="Print stage, rule and slowest-file timings to stderr."),
+        profile_out: Optional[Path] = typer.Option(None, "--profile-out", help="Write the profile as a Chrome trace "
+                                                                              "(JSON, includes the summary)."),
+        max_file_size: int = typer.Option(DEFAULT_MAX_FILE_SIZE, "--max-file-size", help="Skip files larger than this "
+                                                                                         "many bytes (0 = no limit)."),
+        history: bool = typer.Option(False, "--history", help="Record this scan in the scan history and add trend "
+                                                              "charts to an HTML report."),
+        history_db: Optional[Path] = typer.Option(None, "--history-db", help="Scan history database (SQLite)."),
+):
+    """Non-interactive scan that writes a report file."""
+    engine = ScannerEngine()
+    fmt = (fmt or report_format(output)).lower()
+    if fmt not in REPORT_FORMATS:
+        raise typer.BadParameter(f"must be one of {', '.join(REPORT_FORMATS)}", param_hint="--format")
+    archive = _check_source(path)
+
+    engine.profiler = Profiler() if profile or profile_out else None
+    engine.max_file_size = max_file_size
+    if archive:
+        _scan_archive(engine, path)
+    else:
+        engine.spider_search(path)
+        engine.cache = None if no_cache else ResultCache(engine.rules.version)
+        engine.analyze_all(jobs=jobs)
+    trends = ""
+    if history:
+        from history import trend_html
+
+        with _open_history(history_db) as store:
+            store.record(engine)
+            if fmt == "html":
+                trends = trend_html(store, store.root_of(engine))
+    with _span(engine.profiler, "report"):
+        write_report(engine, output, fmt, trends=trends)
+    sys.stderr.write(f"{len(engine.issues)} findings written to {output}\n")
+    _report_skipped(engine)
+    _finish_profile(engine, profile, profile_out)
+
+
+@app.command()
+def merge(
+        partials: List[Path] = typer.Argument(..., help="Partial results written by `scan --shard i/N --partial`."),
+        fmt: str = typer.Option("json", "--format", "-f", help="Output format: json, ndjson or sarif."),
+        output: Optional[str] = typer.Option(None, "--output", "-o", help="Write a report file (.html, .jsonl or "
+                                                                          ".csv) instead of streaming to stdout."),
+        fail_on: str = typer.Option("HIGH", "--fail-on", help="Exit 1 if any finding is at or above this severity "
+                                                             "(CRITICAL, HIGH, MEDIUM, LOW) or NONE to never fail."),
+):
+    """Combine the partial results of a sharded scan into one result."""
+    fmt = fmt.lower()
+    fail_on = fail_on.upper()
+    if output is None and fmt not in IssueStreamWriter.FORMATS:
+        raise typer.BadParameter(f"must be one of {', '.join(IssueStreamWriter.FORMATS)}", param_hint="--format")
+    if fail_on != "NONE" and fail_on not in SEVERITY_ORDER:
+        raise typer.BadParameter("must be CRITICAL, HIGH, MEDIUM, LOW or NONE", param_hint="--fail-on")
+    try:
+        merged = PartialMerge(partials)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise typer.BadParameter(str(e), param_hint="PARTIALS")
+
+    with merged:
+        if merged.missing:
+            sys.stderr.write(f"warning: shards {', '.join(map(str, merged.missing))} of {merged.count} are missing\n")
+        if output:
+            write_issue_report(output, merged.issues(), merged.stats, report_format(output))
+            sys.stderr.write(f"{sum(merged.stats.get(s.lower(), 0) for s in SEVERITY_ORDER)} findings written "
+                             f"to {output}\n")
+        else:
+            writer = IssueStreamWriter(fmt, rules=RuleSet().rules)
+            writer.open()
+            for issue in merged.issues():
+                writer.write(issue)
+            writer.close(merged.stats, merged.score())
+    for path, reason, detail in merged.skipped:
+        sys.stderr.write(f"not analyzed: {path}: {reason}" + (f" ({detail})" if detail else "") + "\n")
+
+    if fail_on != "NONE" and exceeds_threshold(merged.stats, fail_on):
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def fix(
+        path: str = typer.Argument(".", help="Root path to scan and fix."),
+        output: str = typer.Option("-", "--output", "-o", help="Write the unified diff here ('-' = stdout)."),
+        apply: bool = typer.Option(False, "--apply", help="Also rewrite the files (atomically, one write per file) "
+                                                          "and re-analyze them."),
+        pin: List[str] = typer.Option([], "--pin", help="IMAGE=sha256:DIGEST: replace IMAGE:latest with this "
+                                                        "digest (repeatable)."),
+        rule: List[str] = typer.Option([], "--rule", help="Only fix findings of this rule id (repeatable)."),
+        jobs: int = typer.Option(READ_AHEAD, "--jobs", "-j", help="Files rewritten concurrently."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="Extra directory names/globs to skip (repeatable)."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Re-analyze every file and leave the result cache alone."),
+):
+    """Rewrite fixable findings (apk/pip cache flags, apt list cleanup, :latest pins) as one patch."""
+    import re
+
+    if not os.path.isdir(path):
+        raise typer.BadParameter(f"'{path}' is not a directory", param_hint="PATH")
+    pins = {}
+    for item in pin:
+        image, sep, digest = item.partition("=")
+        if not sep or not image or not re.fullmatch(r"sha256:[0-9a-f]{64}", digest):
+            raise typer.BadParameter(f"expected IMAGE=sha256:<64 hex digits>, got '{item}'", param_hint="--pin")
+        pins[image] = digest
+
+    engine = ScannerEngine()
+    unknown = [r for r in rule if engine.rules.get(r) is None or engine.rules.get(r).fix is None]
+    if unknown:
+        fixable = ", ".join(r.id for r in engine.rules.rules if r.fix is not None)
+        raise typer.BadParameter(f"no fix for {', '.join(unknown)} (fixable: {fixable})", param_hint="--rule")
+    engine.spider_search(path, _make_walker(exclude, 1, False))
+    engine.cache = None if no_cache else ResultCache(engine.rules.version)
+    engine.analyze_all()
 
-    # A simple parser to visualize services
-    for cf in engine.composefiles:
-        tree = Tree(f"{ICON_OCTOPUS} [bold magenta]{cf.name}[/bold magenta]")
+    files = applied = unfixed = remaining = failed = 0
+    out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8", newline="")
+    try:
+        for change in plan_fixes(engine, {"pins": pins}, set(rule) or None, jobs):
+            unfixed += len(change.unfixed)
+            if not change.applied:
+                continue
+            out.write(unified_diff(change, engine.issues.rel(change.filepath)))
+            out.flush()
+            if apply:
+                if not apply_fix(change):
+                    failed += 1
+                    sys.stderr.write(f"not written: {engine.issues.rel(change.filepath)} changed since it was read\n")
+                    continue
+                reanalyze_fixed(engine, change)
+            files += 1
+            applied += len(change.applied)
+            remaining += len(change.remaining)
+            for issue in change.remaining:
+                sys.stderr.write(f"still reported after fix: {engine.issues.rel(issue.filepath)}:{issue.line_num} "
+                                 f"{issue.rule_id}\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if engine.cache:
+        engine.cache.save()
+    done = "fixed" if apply else "fixable"
+    sys.stderr.write(f"{applied} findings {done} in {files} files ({applied - remaining} confirmed by re-analysis); "
+                     f"{unfixed} need a manual fix" + (f"; {failed} files not written" if failed else "") + "\n")
+    if failed or remaining:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def watch(
+        path: str = typer.Argument(".", help="Root path to watch."),
+        polling: bool = typer.Option(False, "--polling", help="Poll instead of using inotify."),
+        interval: float = typer.Option(1.0, "--interval", help="Polling interval in seconds."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="Extra directory names/globs to skip (repeatable)."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Re-analyze every file and leave the result cache alone."),
+):
+    """Scan once, then re-analyze Dockerfiles/compose files as they change."""
+    from ui import ICON_CHECK, rprint
+
+    engine = ScannerEngine()
+    if not os.path.isdir(path):
+        raise typer.BadParameter(f"'{path}' is not a directory", param_hint="PATH")
+
+    engine.cache = None if no_cache else ResultCache(engine.rules.version)
+    session = WatchSession(engine, path, _make_walker(exclude, 1, False), polling=polling, interval=interval)
+    rprint(f"[bold green]{ICON_CHECK} Watching {len(engine.dockerfiles) + len(engine.composefiles)} files "
+           f"({session.backend}). {len(engine.issues)} findings, score {engine.score()}/100. Ctrl+C to stop.[/bold green]")
+    try:
+        while True:
+            changes = session.poll(timeout=1.0)
+            if not changes:
+                continue
+            elapsed = session.last_duration * 1000
+            for changed, action in sorted(changes.items()):
+                found = len(engine.issues.for_file(changed)) if action == "updated" else 0
+                label = "[yellow]~[/yellow]" if action == "updated" else "[red]-[/red]" if action == "removed" else "*"
+                rprint(f"{label} {engine.issues.rel(changed) if changed != '*' else 'full rescan'}: {found} findings")
+            rprint(f"[dim]{len(engine.issues)} findings, score {engine.score()}/100 (updated in {elapsed:.0f} ms)[/dim]")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        session.close()
+
+
+def _first_page_renderer():
+    """Renders the first page of the interactive viewer off-screen (imports happen outside the timing)."""
+    import io
+    from rich.console import Console
+    from ui import IssuePager
+
+    sink = Console(file=io.StringIO(), width=160, force_terminal=False)
+    return lambda issues: sink.print(IssuePager(issues, 50).render())
+
+
+@app.command()
+def benchmark(
+        files: int = typer.Option(1000, "--files", help="Dockerfiles + compose files to generate."),
+        lines: int = typer.Option(40, "--lines", help="Lines per generated file."),
+        depth: int = typer.Option(4, "--depth", help="Maximum directory depth."),
+        density: float = typer.Option(0.2, "--density", help="Share of lines that trigger a rule (0-1)."),
+        ignored: int = typer.Option(200, "--ignored", help="Files placed in node_modules/.git subtrees."),
+        seed: int = typer.Option(42, "--seed", help="Random seed; the same seed gives the same corpus."),
+        jobs: int = typer.Option(1, "--jobs", "-j", help="Parallel workers for analysis (0 = one per CPU)."),
+        corpus_dir: Optional[str] = typer.Option(None, "--corpus-dir", help="Generate into (and keep) this directory."),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="Also write the JSON result here."),
+):
+    """Generate a synthetic corpus and time every pipeline stage (JSON on stdout)."""
+    tmp = None
+    if corpus_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="dd-bench-")
+        corpus_dir = tmp.name
+    try:
+        generated = generate_corpus(corpus_dir, files=files, lines=lines, depth=depth, density=density,
+                                    ignored=ignored, seed=seed)
+        result = {"version": RULESET_VERSION, "rules": ScannerEngine().rules.version,
+                  "params": {"files": files, "lines": lines, "depth": depth, "density": density,
+                             "ignored": ignored, "seed": seed, "jobs": jobs},
+                  "generated": generated}
+        result.update(run_benchmark(corpus_dir, jobs=jobs, render=_first_page_renderer()))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    text = json.dumps(result, indent=2)
+    sys.stdout.write(text + "\n")
+    if output:
+        output.write_text(text + "\n", encoding="utf-8")
+
+
+@app.command()
+def serve(
+        host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on."),
+        port: int = typer.Option(8765, "--port", help="TCP port to listen on."),
+        socket_path: Optional[str] = typer.Option(None, "--socket", help="Listen on this Unix socket instead of TCP."),
+        allow: List[str] = typer.Option([], "--allow", help="Directory trees that /scan may read (repeatable, "
+                                                            "default: the current directory)."),
+        jobs: int = typer.Option(1, "--jobs", "-j", help="Analysis threads per /scan request."),
+        rules: Optional[Path] = typer.Option(None, "--rules", help="JSON file with additional custom rules."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Keep the result cache in memory only (not loaded or saved)."),
+        cache_dir: Optional[Path] = typer.Option(None, "--cache-dir", help="Result cache location."),
+        verbose: bool = typer.Option(False, "--verbose", "-v", help="Log every request to stderr."),
+):
+    """Run a scanning daemon with a warm engine and result cache (JSON over HTTP or a Unix socket)."""
+    import signal
+    from service import ScanService, make_server
+
+    engine = ScannerEngine()
+    if rules:
         try:
-            with open(cf, 'r') as f:
-                lines = f.readlines()
-                for line in lines:
-                    line = line.strip()
-                    # Naive service detection
-                    if ":" in line and len(line.split(":")) == 2 and not line.startswith("-") and "version" not in line:
-                        # Check indentation in real usage, here we approximate
-                        if not any(k in line for k in ["image", "build", "ports", "volumes", "environment"]):
-                            service_node = tree.add(f"{ICON_PACKAGE} [bold green]{line.replace(':', '')}[/bold green]")
-        except:
-            pass
-        console.print(tree)
-        console.print("")
-
-    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
-
-
-def module_export():
-    if not engine.issues and engine.stats["files_scanned"] == 0:
-        rprint("[red]No data to export. Run a scan first.[/red]")
-        time.sleep(1.5)
-        return
+            engine.rules.load(rules)
+        except (OSError, ValueError, TypeError) as e:
+            raise typer.BadParameter(str(e), param_hint="--rules")
+    cache = ResultCache(engine.rules.version, cache_dir, save_interval=60.0, persist=not no_cache)
+    service = ScanService(engine.rules, cache, allow or [os.getcwd()], jobs=jobs)
+    try:
+        server = make_server(service, host, port, socket_path, verbose)
+    except OSError as e:
+        raise typer.BadParameter(str(e), param_hint="--socket" if socket_path else "--port")
 
-    rprint("[bold yellow]Generating HTML Report...[/bold yellow]")
-
-    score = 100 - (engine.stats["critical"] * 15) - (engine.stats["high"] * 5) - (engine.stats["medium"] * 2)
-    score = max(0, score)
-    score_color = "#28a745" if score > 80 else "#ffc107" if score > 50 else "#dc3545"
-
-    html_rows = ""
-    for issue in engine.issues:
-        # Determine Color Class
-        if issue.severity == "CRITICAL":
-            color_class = "critical"
-        elif issue.severity == "HIGH":
-            color_class = "high"
-        elif issue.severity == "MEDIUM":
-            color_class = "medium"
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    where = socket_path or f"http://{host}:{server.server_address[1]}"
+    sys.stderr.write(f"serving on {where} (rules {engine.rules.version}, roots: {', '.join(service.allow)})\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+@app.command()
+def client(
+        action: str = typer.Argument(..., help="scan, content, metrics or health."),
+        target: Optional[str] = typer.Argument(None, help="Directory for scan, file for content."),
+        url: str = typer.Option("http://127.0.0.1:8765", "--url", help="Server address."),
+        socket_path: Optional[str] = typer.Option(None, "--socket", help="Talk to a Unix socket instead."),
+        kind: Optional[str] = typer.Option(None, "--kind", help="content: dockerfile or compose "
+                                                                "(default: from the file name)."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="scan: extra directory names/globs to skip."),
+):
+    """Query a running `serve` and print its JSON answer (exit 1 on an error response)."""
+    from service import ServiceClient
+
+    conn = ServiceClient(url, socket_path)
+    try:
+        if action == "scan":
+            status, payload = conn.scan(target or ".", exclude)
+        elif action == "content":
+            if not target:
+                raise typer.BadParameter("content needs a file", param_hint="TARGET")
+            name = os.path.basename(target)
+            kind = kind or ("compose" if name.endswith((".yml", ".yaml")) else "dockerfile")
+            with open(target, "r", encoding="utf-8") as f:
+                status, payload = conn.scan_content(f.read(), kind, name)
+        elif action in ("metrics", "health"):
+            status, payload = conn.metrics() if action == "metrics" else conn.health()
         else:
-            color_class = "low"
-
-        # FIX: Relative Path Calculation
+            raise typer.BadParameter("must be scan, content, metrics or health", param_hint="ACTION")
+    except OSError as e:
+        sys.stderr.write(f"error: {e}\n")
+        raise typer.Exit(code=2)
+    sys.stdout.write(json.dumps(payload, indent=2) + "\n")
+    if status >= 400:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def graph(
+        path: str = typer.Argument(".", help="Root path to scan."),
+        fmt: str = typer.Option("json", "--format", "-f", help="json or dot."),
+        output: Optional[Path] = typer.Option(None, "--output", "-o", help="Write the graph here instead of stdout."),
+        image_map: List[str] = typer.Option([], "--map", help="TAG=DOCKERFILE: an internal image and the Dockerfile "
+                                                              "that builds it (repeatable)."),
+        affected: Optional[str] = typer.Option(None, "--affected", help="Instead of the graph, list who inherits the "
+                                                                       "findings of this Dockerfile, image or service."),
+        severity: Optional[str] = typer.Option(None, "--severity", help="With --affected/--rule: only this severity."),
+        rule: Optional[str] = typer.Option(None, "--rule", help="List who inherits findings of this rule id."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="Extra directory names/globs to skip (repeatable)."),
+        no_cache: bool = typer.Option(False, "--no-cache", help="Re-analyze every file and leave the result cache alone."),
+):
+    """Link compose services, Dockerfiles and base images; export as JSON/DOT or query inherited findings."""
+    fmt = fmt.lower()
+    if fmt not in ("json", "dot"):
+        raise typer.BadParameter("must be json or dot", param_hint="--format")
+    if not os.path.isdir(path):
+        raise typer.BadParameter(f"'{path}' is not a directory", param_hint="PATH")
+    mapping = {}
+    for item in image_map:
+        tag, sep, dockerfile = item.partition("=")
+        if not sep or not tag or not dockerfile:
+            raise typer.BadParameter(f"expected TAG=DOCKERFILE, got '{item}'", param_hint="--map")
+        mapping[tag] = os.path.join(path, dockerfile) if not os.path.isabs(dockerfile) else dockerfile
+
+    engine = ScannerEngine()
+    engine.spider_search(path, _make_walker(exclude, 1, False))
+    engine.cache = None if no_cache else ResultCache(engine.rules.version)
+    engine.analyze_all()
+    project = ProjectGraph.build(engine, mapping)
+
+    if affected or rule:
+        origin = None
+        if affected:
+            origin = project.find(affected)
+            if origin is None:
+                raise typer.BadParameter(f"no Dockerfile, image or service named '{affected}'", param_hint="--affected")
+        text = json.dumps(project.affected(severity.upper() if severity else None, rule, origin), indent=2) + "\n"
+    else:
+        text = project.to_dot() if fmt == "dot" else json.dumps(project.to_json(), indent=2) + "\n"
+    if output:
+        output.write_text(text, encoding="utf-8")
+        sys.stderr.write(f"{len(project.nodes)} nodes, {len(project.edges)} edges written to {output}\n")
+    else:
+        sys.stdout.write(text)
+
+
+@app.command(name="history")
+def history_cmd(
+        path: str = typer.Argument(".", help="Scanned root whose history to show."),
+        directory: str = typer.Option("", "--dir", "-d", help="Subtree (relative to PATH) instead of the whole root."),
+        since: Optional[str] = typer.Option(None, "--since", help="Only scans from this date/time on (ISO 8601)."),
+        until: Optional[str] = typer.Option(None, "--until", help="Only scans up to this date/time (ISO 8601)."),
+        at: Optional[str] = typer.Option(None, "--at", help="Instead of the trend, show the subtree and its "
+                                                            "subdirectories as of the last scan at this date/time."),
+        fmt: str = typer.Option("table", "--format", "-f", help="table or json."),
+        history_db: Optional[Path] = typer.Option(None, "--history-db", help="Scan history database (SQLite)."),
+):
+    """Score and findings per severity over time, for the whole tree or any subdirectory."""
+    from history import parse_when
+
+    fmt = fmt.lower()
+    if fmt not in ("table", "json"):
+        raise typer.BadParameter("must be table or json", param_hint="--format")
+    window = {}
+    for name, value, end_of_day in (("since", since, False), ("until", until, True), ("at", at, True)):
         try:
-            rel_path = os.path.relpath(issue.filepath, engine.root_path)
+            window[name] = parse_when(value, end_of_day) if value else None
         except ValueError:
-            rel_path = Path(issue.filepath).name
-
-        row = f"""
-        <tr>
-            <td><span class="badge {color_class}">{issue.severity}</span></td>
-            <td>{issue.category}</td>
-            <td class="location">{rel_path}:{issue.line_num}</td>
-            <td>{issue.message}</td>
-            <td class="fix-code">{issue.suggestion}</td>
-        </tr>
-        """
-        html_rows += row
-
-    html_template = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>DevOps Security Audit Report</title>
-        <style>
-            body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #1e1e1e; color: #e0e0e0; margin: 0; padding: 20px; }}
-            .container {{ max-width: 1200px; margin: 0 auto; }}
-            .header {{ display: flex; justify-content: space-between; align-items: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 30px; }}
-            .logo h1 {{ margin: 0; color: #00bcd4; text-transform: uppercase; letter-spacing: 2px; }}
-            .score-card {{ text-align: right; }}
-            .score-circle {{ display: inline-block; width: 60px; height: 60px; border-radius: 50%; background: {score_color}; color: white; text-align: center; line-height: 60px; font-weight: bold; font-size: 24px; }}
-            .metrics-grid {{ display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px; margin-bottom: 30px; }}
-            .metric-box {{ background: #252526; padding: 20px; border-radius: 8px; text-align: center; border: 1px solid #333; }}
-            .metric-count {{ font-size: 36px; font-weight: bold; margin-bottom: 5px; }}
-
-            /* COLORS */
-            .critical-text {{ color: #dc3545; }} 
-            .high-text {{ color: #fd7e14; }} 
-            .medium-text {{ color: #ffc107; }} 
-            .low-text {{ color: #0dcaf0; }}
-
-            table {{ width: 100%; border-collapse: collapse; background: #252526; border-radius: 8px; overflow: hidden; }}
-            th, td {{ padding: 15px; text-align: left; border-bottom: 1px solid #333; }}
-            th {{ background: #333; color: #fff; text-transform: uppercase; font-size: 12px; letter-spacing: 1px; }}
-            tr:hover {{ background: #2a2d2e; }}
-
-            .badge {{ padding: 5px 10px; border-radius: 4px; font-size: 12px; font-weight: bold; color: white; }}
-            .badge.critical {{ background: #dc3545; }} /* Red */
-            .badge.high {{ background: #fd7e14; }}     /* Orange */
-            .badge.medium {{ background: #ffc107; color: black; }} /* Yellow */
-            .badge.low {{ background: #0dcaf0; color: black; }}    /* Blue */
-
-            .location {{ font-family: monospace; color: #bbb; }}
-            .fix-code {{ font-family: 'Consolas', monospace; color: #a6e22e; background: #111; padding: 5px 10px; border-radius: 4px; }}
-            .footer {{ margin-top: 50px; text-align: center; color: #666; font-size: 12px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">
-                    <h1>The Architect's Console</h1>
-                    <p>Infrastructure Security Audit</p>
-                </div>
-                <div class="score-card">
-                    <span>System Health Score</span>
-                    <div class="score-circle">{score}</div>
-                </div>
-            </div>
-
-            <div class="metrics-grid">
-                <div class="metric-box">
-                    <div class="metric-count critical-text">{engine.stats['critical']}</div>
-                    <div>Critical</div>
-                </div>
-                <div class="metric-box">
-                    <div class="metric-count high-text">{engine.stats['high']}</div>
-                    <div>High</div>
-                </div>
-                <div class="metric-box">
-                    <div class="metric-count medium-text">{engine.stats['medium']}</div>
-                    <div>Medium</div>
-                </div>
-                <div class="metric-box">
-                    <div class="metric-count low-text">{engine.stats['low']}</div>
-                    <div>Low</div>
-                </div>
-            </div>
-
-            <table>
-                <thead>
-                    <tr>
-                        <th>Severity</th>
-                        <th>Category</th>
-                        <th>File Location</th>
-                        <th>Issue Detected</th>
-                        <th>Recommended Fix</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    {html_rows}
-                </tbody>
-            </table>
-
-            <div class="footer">
-                Generated by DevOps Architect Console • {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-    with open("audit_report.html", "w", encoding="utf-8") as f:
-        f.write(html_template)
-
-    rprint(f"[bold green]{ICON_CHECK} Report exported successfully: ./audit_report.html[/bold green]")
-    webbrowser.open("file://" + os.path.realpath("audit_report.html"))
-    Prompt.ask("\n[dim]Press Enter to return...[/dim]")
-
-
-# --- MAIN MENU LOOP ---
-
-def main_menu():
-    while True:
-        print_banner()
-
-        menu_text = f"""
-    [bold white]SELECT A MODULE:[/bold white]
-
-    [bold cyan][1][/bold cyan] {ICON_SPIDER}  Spider Scan (Discover Files)    [dim]Recursive directory crawler[/dim]
-    [bold cyan][2][/bold cyan] {ICON_SCOPE}  Deep Analysis (The Detective)   [dim]Security & Logic forensics[/dim]
-    [bold cyan][3][/bold cyan] {ICON_MAP}  Topology Mapper                 [dim]Visual service graph[/dim]
-    [bold cyan][4][/bold cyan] {ICON_FIX}  Auto-Fix Preview                [dim]Generate patch suggestions[/dim]
-    [bold cyan][5][/bold cyan] {ICON_CHART}  Export Report                   [dim]Generate HTML Dashboard[/dim]
-
-    [bold red][99] Exit Console[/bold red]
-        """
-        console.print(Panel(menu_text, border_style="blue", title="Main Operations"))
-
-        choice = IntPrompt.ask("[bold yellow]root@docker-detective:~#[/bold yellow]",
-                               choices=["1", "2", "3", "4", "5", "99"])
-
-        if choice == 1:
-            module_spider_scan()
-        elif choice == 2:
-            module_deep_analysis()
-        elif choice == 3:
-            module_topology_map()
-        elif choice == 4:
-            module_fixer_preview()
-        elif choice == 5:
-            module_export()
-        elif choice == 99:
-            rprint("[bold red]Exiting... Stay Secure.[/bold red]")
-            sys.exit()
+            raise typer.BadParameter(f"'{value}' is not an ISO 8601 date", param_hint=f"--{name}")
+    root = os.path.realpath(path)
+    directory = directory.replace(os.sep, "/").strip("/")
+    subtree = os.path.join(root, directory) if directory else root
+
+    with _open_history(history_db) as store:
+        if at:
+            scan_id = store.scan_at(root, window["at"])
+            point = scan_id and store.rollup(root, directory, scan_id)
+            points = [point] if point else []
+            children = store.children(root, directory, scan_id) if point else {}
+        else:
+            points = store.trend(root, directory, window["since"], window["until"])
+            children = {}
+    if fmt == "json":
+        sys.stdout.write(json.dumps({"root": root, "dir": directory, "points": points, "children": children},
+                                    indent=2) + "\n")
+        return
+    if not points:
+        sys.stderr.write(f"no recorded scans of {subtree}"
+                         f"{' at that time' if at else ''} (record them with `scan --history`)\n")
+        raise typer.Exit(code=1)
+
+    import datetime
+    from rich.console import Console
+    from rich.table import Table
+
+    table = Table(title=subtree, header_style="bold")
+    first_col = "Directory" if children else "Scanned"
+    for col in (first_col, "Score", "Critical", "High", "Medium", "Low", "Files"):
+        table.add_column(col, justify="left" if col == first_col else "right")
+    if children:
+        points = [dict(p, label=f"{directory or '.'} (all)") for p in points]
+        points += [dict(p, label=name) for name, p in sorted(children.items(), key=lambda kv: (kv[1]["score"], kv[0]))]
+    for p in points:
+        label = p.get("label") or datetime.datetime.fromtimestamp(p["started"]).strftime("%Y-%m-%d %H:%M")
+        table.add_row(label, str(p["score"]), *(str(p[k]) for k in ("critical", "high", "medium", "low", "files")))
+    Console().print(table)
+
+
+@app.command()
+def discover(
+        path: str = typer.Argument(".", help="Root path to crawl."),
+        exclude: List[str] = typer.Option([], "--exclude", "-x", help="Extra directory names/globs to skip (repeatable)."),
+        walk_threads: int = typer.Option(1, "--walk-threads", help="Threads used to list directories."),
+        no_ignore_files: bool = typer.Option(False, "--no-ignore-files", help="Do not read .gitignore files."),
+):
+    """Crawl only: prints the discovered files and crawler throughput (dirs/sec, files/sec) as JSON."""
+    engine = ScannerEngine()
+    if not os.path.isdir(path):
+        raise typer.BadParameter(f"'{path}' is not a directory", param_hint="PATH")
+    engine.spider_search(path, _make_walker(exclude, walk_threads, no_ignore_files))
+    sys.stdout.write(json.dumps({
+        "dockerfiles": [str(p) for p in engine.dockerfiles],
+        "composefiles": [str(p) for p in engine.composefiles],
+        "walk": engine.walk_stats,
+    }, indent=2) + "\n")
 
 
 if __name__ == "__main__":
-    if os.name == 'nt':
-        os.system("")
-
+    multiprocessing.freeze_support()
     try:
-        main_menu()
+        app()
     except KeyboardInterrupt:
+        from rich import print as rprint
         rprint("\n[bold red]Force Quit Detected.[/bold red]")
         sys.exit()
\ No newline at end of file
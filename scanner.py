@@ -0,0 +1,3055 @@
+"""Docker Detective scanning core: discovery, parsing, rules, caching and report output.
+
+Has no UI dependencies (Rich, Typer), so headless callers and worker processes import it
+quickly; PyYAML is only loaded once a compose file is parsed. `python scanner.py FILE...`
+is the lightweight check used by pre-commit hooks (see main()).
+"""
+import re
+import os
+import sys
+import time
+import datetime
+import bisect
+import collections
+import contextlib
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+from dataclasses import dataclass, asdict, field, fields
+
+SEVERITY_ORDER = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "INFO": 4}
+
+
+@dataclass(slots=True)
+class Issue:
+    severity: str  # CRITICAL, HIGH, MEDIUM, LOW
+    category: str  # SECURITY, PERFORMANCE, BEST_PRACTICE
+    filepath: str
+    line_num: int
+    content: str
+    message: str
+    suggestion: str
+    rule_id: str = ""
+
+
+class IssueStore:
+    """Append-only issue container with maintained indexes.
+
+    Repeated strings (paths, rule ids, messages...) are interned so each distinct value is
+    stored once, and indexes by severity, file and category are kept up to date on append.
+    Views are served from those indexes: nothing needs to re-sort the list or recompute
+    relative paths per row. Behaves like a read-only list for iteration and indexing.
+    Files can be discarded for incremental updates; their slots become None until the
+    next compaction, so readers of by_severity/by_category skip None entries.
+    """
+
+    def __init__(self, root: Path = Path(".")):
+        self.root = root
+        self._items: List[Optional[Issue]] = []
+        self._dead = 0
+        self.by_severity: Dict[str, List[int]] = {}
+        self.by_file: Dict[str, List[int]] = {}
+        self.by_category: Dict[str, List[int]] = {}
+        self._rel: Dict[str, str] = {}
+
+    def append(self, issue: Issue):
+        intern = sys.intern
+        issue.severity = intern(issue.severity)
+        issue.category = intern(issue.category)
+        issue.filepath = intern(issue.filepath)
+        issue.message = intern(issue.message)
+        issue.suggestion = intern(issue.suggestion)
+        issue.rule_id = intern(issue.rule_id)
+        idx = len(self._items)
+        self._items.append(issue)
+        self.by_severity.setdefault(issue.severity, []).append(idx)
+        self.by_file.setdefault(issue.filepath, []).append(idx)
+        self.by_category.setdefault(issue.category, []).append(idx)
+
+    def discard_file(self, filepath: str) -> List[Issue]:
+        """Removes (and returns) all issues of one file.
+
+        Slots are tombstoned rather than deleted so the other indexes stay valid; the store
+        is compacted once more than half of it is dead.
+        """
+        slots = self.by_file.pop(filepath, ())
+        removed = [self._items[idx] for idx in slots]
+        for idx in slots:
+            self._items[idx] = None
+        self._dead += len(removed)
+        if self._dead > len(self._items) // 2:
+            self._compact()
+        return removed
+
+    def _compact(self):
+        live = [item for item in self._items if item is not None]
+        self._items, self._dead = [], 0
+        self.by_severity, self.by_file, self.by_category = {}, {}, {}
+        for issue in live:
+            self.append(issue)
+
+    def __len__(self):
+        return len(self._items) - self._dead
+
+    def __iter__(self):
+        return (item for item in self._items if item is not None) if self._dead else iter(self._items)
+
+    def __getitem__(self, idx):
+        return self._items[idx]
+
+    def severity_order(self) -> List[int]:
+        """Issue indexes ordered by severity (CRITICAL first), insertion order within a severity."""
+        ranks = sorted(self.by_severity, key=lambda sev: SEVERITY_ORDER.get(sev, 99))
+        items = self._items
+        return [idx for sev in ranks for idx in self.by_severity[sev] if items[idx] is not None]
+
+    def by_severity_sorted(self):
+        items = self._items
+        return (items[idx] for idx in self.severity_order())
+
+    def files(self) -> List[str]:
+        return list(self.by_file)
+
+    def for_file(self, filepath: str) -> List[Issue]:
+        items = self._items
+        return [items[idx] for idx in self.by_file.get(filepath, ())]
+
+    def rel(self, filepath: str) -> str:
+        """Path relative to the scan root, computed once per file."""
+        value = self._rel.get(filepath)
+        if value is None:
+            try:
+                value = os.path.relpath(filepath, self.root)
+            except ValueError:
+                value = Path(filepath).name
+            self._rel[filepath] = value
+        return value
+
+
+# --- PROFILING ---
+
+class Profiler:
+    """Opt-in instrumentation: stage wall times, per-rule cost and hits, slowest files.
+
+    Instrumented code checks `profiler is None` (or uses _span) before doing any work, so
+    the hooks cost a branch when profiling is off. Thread-safe; spans of the top level
+    stages and of every file are also kept as Chrome trace events.
+    """
+
+    def __init__(self, top: int = 10):
+        self.top = top
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.stages: Dict[str, list] = {}  # name -> [seconds, calls]
+        self.rules: Dict[str, list] = {}  # rule id -> [seconds, evaluations, hits]
+        self.files: List[tuple] = []  # (seconds, path), min-heap of the slowest
+        self.events: List[dict] = []
+
+    def add(self, name: str, seconds: float, start: Optional[float] = None):
+        with self.lock:
+            entry = self.stages.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+            if start is not None:
+                self._event(name, start, seconds, "stage")
+
+    def rule(self, rule_id: str, seconds: float, hit: bool):
+        with self.lock:
+            entry = self.rules.setdefault(rule_id, [0.0, 0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+            entry[2] += hit
+
+    def file(self, path: str, seconds: float, start: float):
+        with self.lock:
+            if len(self.files) < self.top:
+                heapq.heappush(self.files, (seconds, path))
+            elif seconds > self.files[0][0]:
+                heapq.heapreplace(self.files, (seconds, path))
+            self._event(os.path.basename(path), start, seconds, "file", {"path": path})
+
+    def _event(self, name: str, start: float, seconds: float, cat: str, args: Optional[dict] = None):
+        event = {"name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                 "ts": round((start - self.origin) * 1e6, 1), "dur": round(seconds * 1e6, 1)}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    @contextlib.contextmanager
+    def span(self, name: str, trace: bool = True):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, start if trace else None)
+
+    def summary(self) -> dict:
+        return {
+            "stages": {k: {"seconds": round(v[0], 6), "calls": v[1]} for k, v in self.stages.items()},
+            "rules": {k: {"seconds": round(v[0], 6), "evaluations": v[1], "hits": v[2]}
+                      for k, v in sorted(self.rules.items(), key=lambda kv: -kv[1][0])},
+            "slowest_files": [{"file": p, "seconds": round(t, 6)} for t, p in sorted(self.files, reverse=True)],
+        }
+
+    def save(self, path):
+        """Writes a Chrome trace (chrome://tracing, Perfetto) that also carries the summary."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "summary": self.summary()}, f)
+
+
+_NO_SPAN = contextlib.nullcontext()
+
+
+def _span(profiler: Optional[Profiler], name: str, trace: bool = True):
+    return _NO_SPAN if profiler is None else profiler.span(name, trace)
+
+
+# --- DISCOVERY ---
+
+DEFAULT_EXCLUDES = (".git", "node_modules", "venv", "__pycache__")
+# .dockerignore is deliberately not read: it routinely lists Dockerfile* and docker-compose*,
+# which would hide exactly the files this scanner exists to check.
+IGNORE_FILES = (".gitignore",)
+
+
+def is_dockerfile(name: str) -> bool:
+    return name == "Dockerfile" or name.endswith(".Dockerfile")
+
+
+def is_composefile(name: str) -> bool:
+    return name in ["docker-compose.yml", "docker-compose.yaml"]
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translates a gitignore-style glob (with ** support) into a regex."""
+    out, i, n = [], 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Patterns from one .gitignore, matched relative to the directory that holds it."""
+
+    def __init__(self, base: str, lines: List[str]):
+        self.base = base
+        self.rules = []  # (regex, negate, dir_only, match_basename)
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            # gitignore: a pattern without an inner slash matches at any depth
+            match_basename = "/" not in line
+            line = line.lstrip("/")
+            self.rules.append((re.compile(_glob_to_regex(line) + "$"), negate, dir_only, match_basename))
+
+    @classmethod
+    def load(cls, directory: str, filename: str) -> Optional["IgnoreRules"]:
+        try:
+            with open(os.path.join(directory, filename), "r", encoding="utf-8", errors="replace") as f:
+                lines = f.readlines()
+        except OSError:
+            return None
+        rules = cls(directory, lines)
+        return rules if rules.rules else None
+
+    def match(self, path: str, name: str, is_dir: bool) -> Optional[bool]:
+        """True = ignored, False = re-included by a '!' rule, None = no opinion."""
+        rel = None
+        verdict = None
+        for regex, negate, dir_only, match_basename in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if match_basename:
+                hit = regex.match(name)
+            else:
+                if rel is None:
+                    rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+                hit = regex.match(rel)
+            if hit:
+                verdict = not negate
+        return verdict
+
+
+class SpiderWalker:
+    """os.scandir based crawler that prunes excluded/ignored directories instead of descending into them.
+
+    Directory names in `excludes` are matched exactly (or as globs) against each directory name,
+    never as substrings of the full path. With threads > 1 directory listings are fanned out over
+    a thread pool, which mostly helps on high-latency (network) filesystems.
+    """
+
+    def __init__(self, excludes=DEFAULT_EXCLUDES, use_ignore_files: bool = True, threads: int = 1):
+        self.excludes = set(excludes)
+        self.exclude_globs = [re.compile(_glob_to_regex(x) + "$") for x in excludes if any(c in x for c in "*?[")]
+        self.use_ignore_files = use_ignore_files
+        self.threads = max(1, threads)
+        self.directories: List[str] = []  # every directory visited by the last walk
+        self.stats = {"dirs": 0, "files": 0, "errors": 0, "seconds": 0.0, "dirs_per_sec": 0.0, "files_per_sec": 0.0}
+
+    def walk(self, start_path: str):
+        """Returns (dockerfiles, composefiles), both sorted by path."""
+        self.stats = {k: 0 for k in self.stats}
+        self.directories = [start_path]
+        dockerfiles: List[Path] = []
+        composefiles: List[Path] = []
+        started = time.perf_counter()
+
+        def collect(result):
+            subdirs, docker, compose, entries = result
+            if entries is None:
+                self.stats["errors"] += 1
+            else:
+                self.stats["dirs"] += 1
+                self.stats["files"] += entries
+            dockerfiles.extend(docker)
+            composefiles.extend(compose)
+            self.directories.extend(sub[0] for sub in subdirs)
+            return subdirs
+
+        if self.threads == 1:
+            stack = [(start_path, ())]
+            while stack:
+                stack.extend(collect(self._read_dir(*stack.pop())))
+        else:
+            from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                pending = {pool.submit(self._read_dir, start_path, ())}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for sub in collect(future.result()):
+                            pending.add(pool.submit(self._read_dir, *sub))
+
+        elapsed = time.perf_counter() - started
+        self.stats["seconds"] = round(elapsed, 6)
+        if elapsed > 0:
+            self.stats["dirs_per_sec"] = round(self.stats["dirs"] / elapsed, 1)
+            self.stats["files_per_sec"] = round(self.stats["files"] / elapsed, 1)
+        dockerfiles.sort()
+        composefiles.sort()
+        return dockerfiles, composefiles
+
+    def _excluded(self, name: str) -> bool:
+        return name in self.excludes or any(g.match(name) for g in self.exclude_globs)
+
+    @staticmethod
+    def _ignored(rules, path: str, name: str, is_dir: bool) -> bool:
+        verdict = None
+        for r in rules:
+            hit = r.match(path, name, is_dir)
+            if hit is not None:
+                verdict = hit
+        return bool(verdict)
+
+    def _read_dir(self, directory: str, rules: tuple):
+        """Lists one directory. Runs on pool threads, so it only returns data and never touches self.stats."""
+        subdirs, docker, compose = [], [], []
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError:
+            return subdirs, docker, compose, None
+
+        if self.use_ignore_files:
+            names = {e.name for e in entries}
+            local = [IgnoreRules.load(directory, f) for f in IGNORE_FILES if f in names]
+            rules = rules + tuple(r for r in local if r)
+
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            name = entry.name
+            if is_dir:
+                if self._excluded(name) or (rules and self._ignored(rules, entry.path, name, True)):
+                    continue
+                subdirs.append((entry.path, rules))
+            elif is_dockerfile(name) or is_composefile(name):
+                if rules and self._ignored(rules, entry.path, name, False):
+                    continue
+                (docker if is_dockerfile(name) else compose).append(Path(entry.path))
+        return subdirs, docker, compose, len(entries)
+
+
+# Bump whenever the evaluation logic changes so cached results from older rules are discarded.
+# (Changes to the rule definitions themselves are picked up by RuleSet.version automatically.)
+RULESET_VERSION = "3.5.0"
+
+
+# --- DOCKERFILE PARSER ---
+
+HEREDOC_INSTRUCTIONS = ("RUN", "COPY", "ADD")
+_DIRECTIVE_RE = re.compile(r"^#\s*([a-zA-Z][a-zA-Z0-9]*)\s*=\s*(.+?)\s*$")
+_HEREDOC_RE = re.compile(r"<<(-?)([\"']?)([A-Za-z_][A-Za-z0-9_]*)\2")
+
+
+@dataclass
+class Instruction:
+    keyword: str  # upper-cased, e.g. RUN
+    args: str  # arguments with continuations joined, heredoc bodies appended on new lines
+    start_line: int
+    end_line: int
+    stage: int  # index of the FROM stage, -1 for ARGs before the first FROM
+
+    @property
+    def text(self) -> str:
+        return f"{self.keyword} {self.args}" if self.args else self.keyword
+
+
+@dataclass
+class Stage:
+    index: int
+    base: str  # image or earlier stage name from FROM
+    name: str  # AS alias (lower-cased) or ""
+    line: int
+    content: str
+
+
+def parse_dockerfile(lines: List[str]):
+    """Single pass tokenizer yielding logical Instructions.
+
+    Handles parser directives (only `escape` matters here), escape-character line
+    continuations (with comment and blank lines allowed inside), heredocs on
+    RUN/COPY/ADD and FROM ... AS stage numbering. Never looks back at earlier lines.
+    """
+    escape = "\\"
+    directives = True
+    stage = -1
+    parts: List[str] = []
+    start = 0
+    heredocs: List[tuple] = []  # pending (delimiter, strip_tabs) for the current instruction
+    body: List[str] = []
+    pending: Optional[Instruction] = None
+
+    for i, raw in enumerate(lines):
+        line_num = i + 1
+        line = raw.rstrip("\r\n")
+
+        if pending is not None:
+            # Inside heredoc bodies of an already complete instruction line
+            delimiter, strip_tabs = heredocs[0]
+            check = line.lstrip("\t") if strip_tabs else line
+            if check == delimiter:
+                heredocs.pop(0)
+                if not heredocs:
+                    pending.args += "".join("\n" + b for b in body)
+                    pending.end_line = line_num
+                    yield pending
+                    pending, body = None, []
+            else:
+                body.append(check)
+            continue
+
+        stripped = line.strip()
+        if directives:
+            m = _DIRECTIVE_RE.match(stripped)
+            if m:
+                if m.group(1).lower() == "escape" and m.group(2) in ("\\", "`"):
+                    escape = m.group(2)
+                continue
+            directives = False
+
+        if not parts:
+            if not stripped or stripped.startswith("#"):
+                continue
+            start = line_num
+        elif not stripped or stripped.startswith("#"):
+            # Blank and comment lines inside a continuation are skipped
+            continue
+
+        if stripped.endswith(escape):
+            parts.append(stripped[:-1].strip())
+            continue
+        parts.append(stripped)
+
+        logical = " ".join(p for p in parts if p)
+        parts = []
+        keyword, _, args = logical.partition(" ")
+        keyword = keyword.upper()
+        args = args.strip()
+        if keyword == "FROM":
+            stage += 1
+        instruction = Instruction(keyword, args, start, line_num, stage)
+
+        if keyword in HEREDOC_INSTRUCTIONS and "<<" in args:
+            heredocs = [(m.group(3), m.group(1) == "-") for m in _HEREDOC_RE.finditer(args)]
+            if heredocs:
+                pending = instruction
+                continue
+        yield instruction
+
+    if parts:
+        logical = " ".join(p for p in parts if p)
+        keyword, _, args = logical.partition(" ")
+        keyword = keyword.upper()
+        if keyword == "FROM":
+            stage += 1
+        yield Instruction(keyword, args.strip(), start, len(lines), stage)
+    elif pending is not None:
+        # Unterminated heredoc: keep what was read
+        pending.args += "".join("\n" + b for b in body)
+        pending.end_line = len(lines)
+        yield pending
+
+
+def parse_from(instruction: Instruction) -> Stage:
+    """Splits `FROM [--platform=..] image [AS name]` into a Stage."""
+    tokens = [t for t in instruction.args.split() if not t.startswith("--")]
+    base = tokens[0] if tokens else ""
+    name = tokens[2].lower() if len(tokens) >= 3 and tokens[1].upper() == "AS" else ""
+    return Stage(instruction.stage, base, name, instruction.start_line, instruction.text)
+
+
+def base_images(instructions) -> List[list]:
+    """[image, edge kind] for the images a Dockerfile builds FROM (not `scratch` or its own earlier stages).
+
+    The base the final stage descends from (following `FROM <stage>` links) is a "from" edge: the
+    shipped image inherits it. Bases of the other stages are "build_from": used only while building.
+    """
+    stages = [parse_from(ins) for ins in instructions if ins.keyword == "FROM"]
+    parents: List[Optional[int]] = []
+    names: Dict[str, int] = {}
+    for i, stage in enumerate(stages):
+        parents.append(names.get(stage.base.lower()))
+        if stage.name:
+            names[stage.name] = i
+    shipped = set()
+    current = len(stages) - 1 if stages else None
+    while current is not None:
+        shipped.add(current)
+        current = parents[current]
+    bases = []
+    for i, stage in enumerate(stages):
+        if parents[i] is not None or not stage.base or stage.base.lower() == "scratch":
+            continue
+        base = [stage.base, "from" if i in shipped else "build_from"]
+        if base not in bases:
+            bases.append(base)
+    return bases
+
+
+# --- COMPOSE MODEL ---
+
+yaml = None  # imported by _load_yaml() on first use
+_YAML_LOADER = None
+_BOOL_TAG = "tag:yaml.org,2002:bool"
+
+
+@dataclass
+class ComposeEntry:
+    """One value of a service field, e.g. a single volume or environment variable."""
+    service: str
+    field: str
+    value: str
+    line: int
+    stage: int  # index of the service in the file
+
+    @property
+    def keyword(self) -> str:
+        return self.field.upper()
+
+    @property
+    def start_line(self) -> int:
+        return self.line
+
+    @property
+    def text(self) -> str:
+        return f"{self.field}: {self.value}"
+
+
+@dataclass
+class ComposeService:
+    name: str
+    line: int
+    image: str = ""
+    build: str = ""  # build context
+    dockerfile: str = ""
+    depends_on: List[str] = field(default_factory=list)
+    networks: List[str] = field(default_factory=list)
+    volumes: List[str] = field(default_factory=list)
+    ports: List[str] = field(default_factory=list)
+    environment: Dict[str, str] = field(default_factory=dict)
+    privileged: bool = False
+    entries: List[ComposeEntry] = field(default_factory=list)
+
+
+@dataclass
+class ComposeModel:
+    path: str
+    services: List[ComposeService] = field(default_factory=list)
+    networks: List[str] = field(default_factory=list)
+    volumes: List[str] = field(default_factory=list)
+    error: str = ""
+
+    @property
+    def entries(self) -> List[ComposeEntry]:
+        return [e for svc in self.services for e in svc.entries]
+
+
+def _mapping_items(node):
+    """(key, value node) pairs of a YAML mapping, with `<<` merge keys expanded."""
+    merged, own = [], []
+    for key, value in node.value:
+        if key.value == "<<":
+            sources = value.value if isinstance(value, yaml.SequenceNode) else [value]
+            for src in sources:
+                if isinstance(src, yaml.MappingNode):
+                    merged.extend(_mapping_items(src))
+        else:
+            own.append((key.value, value))
+    if not merged:
+        return own
+    keys = {k for k, _ in own}
+    return [(k, v) for k, v in merged if k not in keys] + own
+
+
+def _scalar(node) -> str:
+    if node.tag == _BOOL_TAG:
+        return "true" if node.value.lower() in ("true", "yes", "on", "y") else "false"
+    return node.value
+
+
+def _flatten(node):
+    """Yields (value, line) for every leaf under a service field."""
+    if isinstance(node, yaml.ScalarNode):
+        yield _scalar(node), node.start_mark.line + 1
+    elif isinstance(node, yaml.SequenceNode):
+        for item in node.value:
+            yield from _flatten(item)
+    elif isinstance(node, yaml.MappingNode):
+        for key, value in _mapping_items(node):
+            if isinstance(value, yaml.ScalarNode):
+                yield f"{key}={_scalar(value)}" if value.value != "" else key, value.start_mark.line + 1
+            else:
+                # e.g. depends_on: {db: {condition: ...}} or long-syntax volumes
+                children = list(_flatten(value))
+                if isinstance(value, yaml.MappingNode) and children:
+                    yield key, value.start_mark.line
+                yield from children
+
+
+def _parse_service(name: str, index: int, key_line: int, node) -> ComposeService:
+    svc = ComposeService(name, key_line)
+    if not isinstance(node, yaml.MappingNode):
+        return svc
+    for fld, value in _mapping_items(node):
+        values = list(_flatten(value))
+        svc.entries.extend(ComposeEntry(name, fld, v, line, index) for v, line in values)
+        plain = [v for v, _ in values]
+        if fld == "image" and plain:
+            svc.image = plain[0]
+        elif fld == "build":
+            if isinstance(value, yaml.ScalarNode):
+                svc.build = value.value
+            elif isinstance(value, yaml.MappingNode):
+                opts = {k: v.value for k, v in _mapping_items(value) if isinstance(v, yaml.ScalarNode)}
+                svc.build = opts.get("context", ".")
+                svc.dockerfile = opts.get("dockerfile", "")
+        elif fld == "privileged":
+            svc.privileged = plain == ["true"]
+        elif fld == "environment":
+            for v in plain:
+                key, _, val = v.partition("=")
+                svc.environment[key] = val
+        elif fld in ("depends_on", "networks"):
+            # Mapping forms carry extra options; only the names are kept
+            names = [k for k, _ in _mapping_items(value)] if isinstance(value, yaml.MappingNode) else plain
+            setattr(svc, fld, names)
+        elif fld in ("volumes", "ports"):
+            setattr(svc, fld, plain)
+    return svc
+
+
+def _load_yaml():
+    global yaml, _YAML_LOADER
+    import yaml
+    _YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_compose(text: str, path: str = "") -> ComposeModel:
+    """Parses a compose file into a ComposeModel in one pass over the YAML node tree."""
+    if _YAML_LOADER is None:
+        _load_yaml()
+    model = ComposeModel(str(path))
+    try:
+        root = yaml.compose(text, Loader=_YAML_LOADER)
+    except yaml.YAMLError as e:
+        mark = getattr(e, "problem_mark", None)
+        problem = getattr(e, "problem", None) or (str(e).splitlines()[0] if str(e) else "invalid YAML")
+        model.error = f"line {mark.line + 1}: {problem}" if mark is not None else problem
+        return model
+    if not isinstance(root, yaml.MappingNode):
+        return model
+
+    top = dict(_mapping_items(root))
+    services = top.get("services")
+    if isinstance(services, yaml.MappingNode):
+        items = [(k.value, k.start_mark.line + 1, v) for k, v in services.value if k.value != "<<"]
+    else:
+        # Legacy v1 files: services live at the top level
+        items = [(k.value, k.start_mark.line + 1, v) for k, v in root.value
+                 if isinstance(v, yaml.MappingNode) and k.value not in ("version", "networks", "volumes")
+                 and not k.value.startswith("x-")]
+    model.services = [_parse_service(name, i, line, node) for i, (name, line, node) in enumerate(items)]
+    for section in ("networks", "volumes"):
+        node = top.get(section)
+        if isinstance(node, yaml.MappingNode):
+            setattr(model, section, [k.value for k, _ in node.value])
+    return model
+
+
+# --- RULES ---
+
+@dataclass(frozen=True)
+class Rule:
+    """A declarative check.
+
+    A rule fires on a line when any of its `triggers` occurs in it (case-insensitively if
+    `ignore_case`), none of `unless` and all of `requires` occur (case-sensitive), and the
+    optional `check(content, units, index)` agrees.
+
+    Rules run per unit: a logical Instruction for Dockerfiles, a ComposeEntry (one value of a
+    service field, rendered as "field: value") for compose files. `instructions` limits a rule
+    to some keywords (Dockerfile instructions or compose fields); a rule with keywords but no
+    triggers matches every such unit. An `absent` rule fires once per file when no unit it
+    applies to (keyword and triggers) passes it. For Dockerfiles only the effective unit counts:
+    the last one in the final stage, or in the stages it is built FROM when the final stage
+    has none. Compose files have no stages, so any passing entry of the file satisfies it.
+
+    A rule may also offer a `fix(lines, issue, options)` rewrite: it gets the physical lines of
+    the finding's unit (a whole instruction with its continuation lines, or one compose line)
+    and returns their replacement, or None when it cannot fix this case safely (see fix_file).
+    """
+    id: str
+    kind: str  # dockerfile, compose
+    severity: str
+    category: str
+    message: str
+    suggestion: str
+    triggers: tuple
+    ignore_case: bool = False
+    unless: tuple = ()
+    requires: tuple = ()
+    check: Optional[Callable[[str, list, int], bool]] = None
+    absent: bool = False
+    instructions: tuple = ()
+    fix: Optional[Callable[[List[str], Issue, dict], Optional[List[str]]]] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Rule":
+        """Builds a custom rule from JSON data; raises ValueError naming the rule and the bad field."""
+        if not isinstance(data, dict):
+            raise ValueError(f"Rule must be an object, got {type(data).__name__}")
+        rule_id = data.get("id")
+        if not isinstance(rule_id, str) or not rule_id:
+            raise ValueError(f"Rule {data.get('id')!r}: 'id' must be a non-empty string")
+        allowed = [f.name for f in fields(cls) if f.name not in ("check", "fix")]
+        unknown = sorted(set(data) - set(allowed))
+        if unknown:
+            raise ValueError(f"Rule {rule_id}: unknown field(s) {', '.join(map(repr, unknown))} "
+                             f"(allowed: {', '.join(allowed)})")
+        data = dict(data)
+        for key in ("category", "message", "suggestion"):
+            if not isinstance(data.get(key), str):
+                raise ValueError(f"Rule {rule_id}: {key!r} must be a string")
+        if data.get("kind") not in ("dockerfile", "compose"):
+            raise ValueError(f"Rule {rule_id}: 'kind' must be 'dockerfile' or 'compose', got {data.get('kind')!r}")
+        severity = data.get("severity")
+        if not isinstance(severity, str) or severity.upper() not in SEVERITY_ORDER:
+            raise ValueError(f"Rule {rule_id}: 'severity' must be one of {', '.join(SEVERITY_ORDER)}, "
+                             f"got {severity!r}")
+        data["severity"] = severity.upper()
+        for key in ("triggers", "unless", "requires", "instructions"):
+            value = data.get(key, ())
+            if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+                raise ValueError(f"Rule {rule_id}: {key!r} must be a list of strings")
+            data[key] = tuple(value)
+        for key in ("ignore_case", "absent"):
+            if not isinstance(data.get(key, False), bool):
+                raise ValueError(f"Rule {rule_id}: {key!r} must be true or false")
+        return cls(**data)
+
+
+def _is_inline_value(content: str, entries: List[ComposeEntry], i: int) -> bool:
+    value = entries[i].value.partition("=")[2]
+    return bool(value) and not value.startswith("$")
+
+
+def _is_non_root_user(content: str, instructions: List[Instruction], i: int) -> bool:
+    user = instructions[i].args.split(":", 1)[0].strip().strip("\"'")
+    return user.lower() not in ("", "root", "0")
+
+
+def _is_enabled_healthcheck(content: str, instructions: List[Instruction], i: int) -> bool:
+    return instructions[i].args.strip().upper() != "NONE"
+
+
+def _add_flag(lines: List[str], pattern: str, flag: str) -> List[str]:
+    """Puts `flag` right after every match of `pattern` (e.g. each `apk add` of a RUN)."""
+    return [re.sub(pattern, lambda m: f"{m.group(0)} {flag}", line) for line in lines]
+
+
+# fixes are module-level functions so rules stay picklable for process workers
+def _fix_apk_cache(lines: List[str], issue: Issue, options: dict) -> Optional[List[str]]:
+    return _add_flag(lines, r"\bapk\s+add\b", "--no-cache")
+
+
+def _fix_pip_cache(lines: List[str], issue: Issue, options: dict) -> Optional[List[str]]:
+    return _add_flag(lines, r"\bpip\s+install\b", "--no-cache-dir")
+
+
+def _fix_apt_lists(lines: List[str], issue: Issue, options: dict) -> Optional[List[str]]:
+    """Appends the list cleanup to the end of the same RUN (shell form, no heredoc or trailing comment)."""
+    last = lines[-1].rstrip()
+    args = lines[0].strip().partition(" ")[2].lstrip()
+    if args.startswith("[") or "#" in last or any(_HEREDOC_RE.search(line) for line in lines):
+        return None
+    return lines[:-1] + [f"{last} && rm -rf /var/lib/apt/lists/*"]
+
+
+def _fix_latest_tag(lines: List[str], issue: Issue, options: dict) -> Optional[List[str]]:
+    """image: name:latest -> name@<digest>, for images given a digest in options["pins"]."""
+    image = issue.content.partition(":")[2].strip().strip("\"'")
+    if not image.endswith(":latest"):
+        return None
+    name = image[:-len(":latest")]
+    pins = options.get("pins") or {}
+    digest = pins.get(image) or pins.get(name)
+    if not digest or image not in lines[0]:
+        return None
+    return [lines[0].replace(image, f"{name}@{digest}", 1)] + lines[1:]
+
+
+BUILTIN_RULES = (
+    Rule("DF-SUDO", "dockerfile", "CRITICAL", "SECURITY", "Sudo used in build.",
+         "Remove 'sudo'. Build as root, drop privileges later.", ("sudo",), ignore_case=True),
+    Rule("DF-APK-CACHE", "dockerfile", "MEDIUM", "PERFORMANCE", "APK Cache not disabled.",
+         "Use 'apk add --no-cache ...' to reduce image size.", ("apk add",), unless=("--no-cache",),
+         instructions=("RUN",), fix=_fix_apk_cache),
+    Rule("DF-APT-LISTS", "dockerfile", "MEDIUM", "PERFORMANCE", "APT Lists not cleaned.",
+         "Add '&& rm -rf /var/lib/apt/lists/*' to the same RUN command.", ("apt-get install", "apt install"),
+         unless=("rm -rf /var/lib/apt/lists",), instructions=("RUN",), fix=_fix_apt_lists),
+    Rule("DF-PIP-CACHE", "dockerfile", "LOW", "PERFORMANCE", "Pip cache stored.",
+         "Use 'pip install --no-cache-dir' to save space.", ("pip install",), unless=("--no-cache-dir",),
+         instructions=("RUN",), fix=_fix_pip_cache),
+    Rule("DF-SSH-PORT", "dockerfile", "CRITICAL", "SECURITY", "SSH Port Exposed.",
+         "Do not run SSH in containers. Use 'docker exec'.", ("EXPOSE 22",), ignore_case=True,
+         instructions=("EXPOSE",)),
+    Rule("DF-HARDCODED-SECRET", "dockerfile", "CRITICAL", "SECURITY", "Potential Hardcoded Secret.",
+         "Use Docker Secrets or run-time ENVs.", ("AWS_ACCESS_KEY", "SECRET_KEY", "PASSWORD="), ignore_case=True,
+         instructions=("ENV",)),
+    Rule("DF-ROOT-USER", "dockerfile", "HIGH", "SECURITY", "Running as Root.",
+         "Add 'USER <uid>' instruction.", (), check=_is_non_root_user, absent=True, instructions=("USER",)),
+    Rule("DF-NO-HEALTHCHECK", "dockerfile", "LOW", "BEST_PRACTICE", "No Healthcheck.",
+         "Add HEALTHCHECK instruction for auto-recovery.", (), check=_is_enabled_healthcheck, absent=True,
+         instructions=("HEALTHCHECK",)),
+    Rule("DC-DOCKER-SOCKET", "compose", "CRITICAL", "SECURITY", "Docker Socket Mounted.",
+         "This allows the container to delete all other containers. Avoid if possible.", ("/var/run/docker.sock",),
+         instructions=("VOLUMES",)),
+    Rule("DC-PRIVILEGED", "compose", "CRITICAL", "SECURITY", "Privileged Mode.",
+         "Container has full host root capabilities. Extremely dangerous.", ("privileged: true",),
+         instructions=("PRIVILEGED",)),
+    Rule("DC-LATEST-TAG", "compose", "HIGH", "RELIABILITY", "Using :latest tag.",
+         "Pin specific versions for production stability.", (":latest",), instructions=("IMAGE",),
+         fix=_fix_latest_tag),
+    Rule("DC-INLINE-SECRET", "compose", "HIGH", "SECURITY", "Inline Environment Secrets.",
+         "Use an .env file or Docker Secrets.", ("PASSWORD",), ignore_case=True, check=_is_inline_value,
+         instructions=("ENVIRONMENT",)),
+)
+
+
+def _trie_regex(words) -> str:
+    """Builds a prefix-factored alternation so matching cost depends on word length, not word count."""
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+class CompiledRules:
+    """All rules of one kind compiled into a single matcher.
+
+    Every trigger goes into one case-insensitive trie regex wrapped in a lookahead, so a
+    line is scanned exactly once and every trigger occurrence (overlapping ones included)
+    is reported. Only rules whose trigger was seen are evaluated further.
+    """
+
+    def __init__(self, rules, kind: str = "dockerfile"):
+        self.kind = kind
+        self.rules = list(rules)
+        self.by_text: Dict[str, list] = {}  # upper-cased trigger -> [(rule index, trigger, ignore_case)]
+        self.by_keyword: Dict[str, list] = {}  # instruction keyword -> rule indexes without triggers
+        for idx, rule in enumerate(self.rules):
+            for trigger in rule.triggers:
+                self.by_text.setdefault(trigger.upper(), []).append((idx, trigger, rule.ignore_case))
+            if not rule.triggers:
+                for keyword in rule.instructions:
+                    self.by_keyword.setdefault(keyword.upper(), []).append(idx)
+        self.keywords = [frozenset(k.upper() for k in rule.instructions) for rule in self.rules]
+        # The regex returns the longest trigger at each position; shorter triggers that are
+        # prefixes of it matched at the same position too.
+        self.prefixes = {text: [t for t in self.by_text if text.startswith(t)] for text in self.by_text}
+        self.regex = re.compile("(?=(" + _trie_regex(self.by_text) + "))", re.IGNORECASE) if self.by_text else None
+
+    def _hits(self, content: str) -> set:
+        hits = set()
+        if self.regex is None:
+            return hits
+        for m in self.regex.finditer(content):
+            start = m.start()
+            for text in self.prefixes[m.group(1).upper()]:
+                for idx, trigger, ignore_case in self.by_text[text]:
+                    if ignore_case or content.startswith(trigger, start):
+                        hits.add(idx)
+        return hits
+
+    @staticmethod
+    def _passes(rule: Rule, content: str, context: list, i: int) -> bool:
+        if any(u in content for u in rule.unless) or not all(r in content for r in rule.requires):
+            return False
+        return rule.check is None or rule.check(content, context, i)
+
+    def evaluate_instructions(self, instructions: list, filepath, profiler: Optional[Profiler] = None) -> List[Issue]:
+        """Evaluates Instructions or ComposeEntries.
+
+        Absent rules are checked on the final FROM stage of a Dockerfile; in a compose file
+        (which has no stages) they are satisfied by any passing entry of the file.
+        """
+        found: List[Issue] = []
+        name = str(filepath)
+        rules = self.rules
+        staged = self.kind == "dockerfile"
+        stages: List[Stage] = []
+        last: List[dict] = []  # per stage: absent rule index -> (passed, instruction) of its last candidate
+        effective: dict = {}  # absent rule index -> (passed, unit) that decides it
+
+        for i, ins in enumerate(instructions):
+            if staged and ins.keyword == "FROM":
+                stages.append(parse_from(ins))
+                last.append({})
+            content = ins.text
+            if profiler is None:
+                hits = self._hits(content)
+            else:
+                started = time.perf_counter()
+                hits = self._hits(content)
+                profiler.add("match", time.perf_counter() - started)
+            hits.update(self.by_keyword.get(ins.keyword, ()))
+
+            for idx in sorted(hits):
+                rule = rules[idx]
+                if self.keywords[idx] and ins.keyword not in self.keywords[idx]:
+                    continue
+                if profiler is None:
+                    passed = self._passes(rule, content, instructions, i)
+                else:
+                    started = time.perf_counter()
+                    passed = self._passes(rule, content, instructions, i)
+                    profiler.rule(rule.id, time.perf_counter() - started, passed)
+                if rule.absent:
+                    if not staged:
+                        if not effective.get(idx, (False,))[0]:
+                            effective[idx] = (passed, ins)
+                    elif ins.stage >= 0:
+                        last[ins.stage][idx] = (passed, ins)
+                    continue
+                if not passed:
+                    continue
+                found.append(Issue(rule.severity, rule.category, name, ins.start_line, content, rule.message,
+                                   rule.suggestion, rule.id))
+
+        # The effective value is the last candidate of the final stage, else of the stage it is
+        # built FROM, and so on: `USER app` then `USER root` runs as root, and so does a stage
+        # that only inherits `USER root` from its parent.
+        final = stages[-1] if stages else None
+        names = {st.name: st.index for st in stages if st.name}
+        current = final
+        while current is not None:
+            for idx, state in last[current.index].items():
+                effective.setdefault(idx, state)
+            parent = names.get(current.base.lower())
+            current = stages[parent] if parent is not None and parent < current.index else None
+
+        for idx, rule in enumerate(rules):
+            if not rule.absent:
+                continue
+            passed, ins = effective.get(idx, (False, None))
+            if passed:
+                continue
+            if ins is not None:
+                found.append(Issue(rule.severity, rule.category, name, ins.start_line, ins.text,
+                                   rule.message, rule.suggestion, rule.id))
+            elif final is None:
+                found.append(Issue(rule.severity, rule.category, name, 0, "Global", rule.message,
+                                   rule.suggestion, rule.id))
+            else:
+                found.append(Issue(rule.severity, rule.category, name, final.line, final.content,
+                                   rule.message, rule.suggestion, rule.id))
+        return found
+
+
+class RuleSet:
+    """The rule registry: built-in rules plus any custom ones, compiled once per kind."""
+
+    def __init__(self, rules=BUILTIN_RULES):
+        self.rules = list(rules)
+        self._compile()
+
+    def register(self, rule: Rule):
+        if any(r.id == rule.id for r in self.rules):
+            raise ValueError(f"Duplicate rule id: {rule.id}")
+        self.rules.append(rule)
+        self._compile()
+
+    def load(self, path) -> int:
+        """Registers custom rules from a JSON list of rule objects. Returns how many were added."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError("Custom rules must be a JSON list of rule objects")
+        added = []
+        for item in data:
+            rule = Rule.from_dict(item)
+            if any(r.id == rule.id for r in self.rules + added):
+                raise ValueError(f"Duplicate rule id: {rule.id}")
+            added.append(rule)
+        self.rules.extend(added)
+        self._compile()
+        return len(added)
+
+    def _compile(self):
+        self.compiled = {kind: CompiledRules((r for r in self.rules if r.kind == kind), kind)
+                         for kind in ("dockerfile", "compose")}
+        signature = json.dumps([RULESET_VERSION] + [
+            [r.id, r.kind, r.severity, r.category, r.message, r.suggestion, r.triggers, r.ignore_case,
+             r.unless, r.requires, getattr(r.check, "__name__", None), r.absent, r.instructions]
+            for r in self.rules])
+        self.version = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+
+    def get(self, rule_id: str) -> Optional[Rule]:
+        return next((r for r in self.rules if r.id == rule_id), None)
+
+    def evaluate(self, kind: str, units: list, filepath, profiler: Optional[Profiler] = None) -> List[Issue]:
+        return self.compiled[kind].evaluate_instructions(units, filepath, profiler)
+
+
+# --- READ STAGE ---
+
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024  # real Dockerfiles / compose files are a few KB
+SNIFF_BYTES = 8192
+READ_AHEAD = 8  # files read concurrently ahead of a serial analysis
+
+
+@dataclass(frozen=True)
+class ReadFailure:
+    """Returned instead of a file's text (or findings) when it was not analyzed."""
+    reason: str  # too-large / binary (skipped by policy), undecodable / unreadable / unparsable (errors)
+    detail: str = ""
+
+    @property
+    def skipped(self) -> bool:
+        return self.reason in ("too-large", "binary")
+
+
+def read_text(path, max_size: int = DEFAULT_MAX_FILE_SIZE):
+    """Reads a candidate file as UTF-8 text (newlines normalized like text mode), or returns a ReadFailure."""
+    return read_source(path, max_size)[0]
+
+
+def read_source(path, max_size: int = DEFAULT_MAX_FILE_SIZE):
+    """read_text() plus the file's stamp: (mtime_ns, size, sha1) of exactly the bytes that were read.
+
+    The stat is taken before reading, so a file changed mid-read never gets a stamp that
+    matches its new content (see ResultCache.put). The stamp is None for a ReadFailure.
+    """
+    try:
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            digest = hashlib.sha1()
+            text = read_stream(f, st.st_size, max_size, digest)
+    except OSError as e:
+        return ReadFailure("unreadable", e.strerror or str(e)), None
+    if isinstance(text, ReadFailure):
+        return text, None
+    return text, (st.st_mtime_ns, st.st_size, digest.hexdigest())
+
+
+def read_stream(f, size: int, max_size: int = DEFAULT_MAX_FILE_SIZE, digest=None):
+    """read_text() for an open binary file object of a known size (e.g. an archive member).
+
+    Never reads more than max_size + 1 bytes (0 = no limit), so a huge accidental name match
+    costs one bounded read, and files with a NUL byte in the first SNIFF_BYTES are treated as binary.
+    `digest` (a hashlib object), if given, is fed the raw bytes that were read.
+    """
+    if max_size and size > max_size:
+        return ReadFailure("too-large", f"{size} bytes")
+    data = f.read(SNIFF_BYTES)
+    if b"\0" in data:
+        return ReadFailure("binary")
+    if len(data) == SNIFF_BYTES:
+        data += f.read(max_size + 1 - len(data) if max_size else -1)
+    if max_size and len(data) > max_size:
+        return ReadFailure("too-large", f"more than {max_size} bytes")
+    if digest is not None:
+        digest.update(data)
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return ReadFailure("undecodable", f"invalid UTF-8 at byte {e.start}")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def prefetch(read: Callable, paths, workers: int = READ_AHEAD):
+    """Yields read(path) for every path in order, keeping up to 4 * workers reads in flight.
+
+    Lets file I/O (slow on network filesystems) overlap with the caller's CPU-bound work.
+    """
+    if workers <= 0:
+        yield from map(read, paths)
+        return
+    from concurrent.futures import ThreadPoolExecutor
+
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque(pool.submit(read, p) for p in itertools.islice(paths, workers * 4))
+        while pending:
+            text = pending.popleft().result()
+            for p in itertools.islice(paths, 1):
+                pending.append(pool.submit(read, p))
+            yield text
+
+
+# --- ARCHIVE SOURCE ---
+
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def image_config_instructions(config: dict, image: str) -> List[Instruction]:
+    """Dockerfile equivalent of an image config JSON (`docker save` / OCI), so the dockerfile rules apply.
+
+    Only the fields the rules look at are mapped: User, Healthcheck, ExposedPorts and Env. The
+    config has no lines, so every instruction is on line 0 (findings without a location).
+    """
+    cfg = config.get("config") or {}
+    out = [Instruction("FROM", image, 0, 0, 0)]
+
+    def add(keyword: str, args: str):
+        out.append(Instruction(keyword, " ".join(str(args).split()), 0, 0, 0))
+
+    if cfg.get("User"):
+        add("USER", cfg["User"])
+    test = (cfg.get("Healthcheck") or {}).get("Test") or []
+    if test:
+        add("HEALTHCHECK", "NONE" if test[0] == "NONE" else "CMD " + " ".join(test[1:]))
+    for port in sorted(cfg.get("ExposedPorts") or {}):
+        add("EXPOSE", port)
+    for env in cfg.get("Env") or []:
+        add("ENV", env)
+    return out
+
+
+def iter_archive(path, max_size: int = DEFAULT_MAX_FILE_SIZE, excludes=DEFAULT_EXCLUDES):
+    """Streams a (compressed) tar in one sequential pass, nothing is extracted to disk.
+
+    Yields (kind, member name, text or ReadFailure) for Dockerfile and compose members as they
+    are reached, then ("image", config name, instructions) for every image config found; those
+    are held back to the end so that manifest.json (which `docker save` writes last) can name them.
+    Memory stays bounded: members are read only if they are candidates of at most max_size bytes.
+    """
+    configs: Dict[str, dict] = {}
+    tags: Dict[str, str] = {}
+    import tarfile
+
+    with tarfile.open(path, mode="r|*") as tar:
+        while True:
+            info = tar.next()
+            if info is None:
+                break
+            tar.members.clear()  # stream mode would otherwise keep every TarInfo
+            if not info.isfile():
+                continue
+            name = re.sub(r"^(\./)+", "", info.name)
+            parts = name.split("/")
+            base = parts[-1]
+            if any(part in excludes for part in parts[:-1]):
+                continue
+            if is_dockerfile(base) or is_composefile(base):
+                kind = "dockerfile" if is_dockerfile(base) else "compose"
+                yield kind, name, read_stream(tar.extractfile(info), info.size, max_size)
+                continue
+            if not (base.endswith(".json") or parts[0] == "blobs") or info.size > DEFAULT_MAX_FILE_SIZE:
+                continue  # image configs and manifests are a few KB, layer blobs are skipped unread
+            f = tar.extractfile(info)
+            head = f.read(1)
+            if head not in (b"{", b"["):
+                continue
+            try:
+                doc = json.loads(head + f.read())
+            except ValueError:
+                continue
+            if base == "manifest.json" and isinstance(doc, list):
+                for image in doc:
+                    if isinstance(image, dict) and image.get("Config") and image.get("RepoTags"):
+                        tags[image["Config"]] = image["RepoTags"][0]
+            elif isinstance(doc, dict) and isinstance(doc.get("config"), dict) and "rootfs" in doc:
+                configs[name] = doc
+    for name, doc in configs.items():
+        yield "image", name, image_config_instructions(doc, tags.get(name, name))
+
+
+# --- GIT SOURCE ---
+
+def _git(repo: str, *args: str) -> str:
+    import subprocess
+
+    proc = subprocess.run(["git", "-C", repo, *args], capture_output=True)
+    if proc.returncode != 0:
+        raise ValueError(proc.stderr.decode("utf-8", "replace").strip() or f"git {args[0]} failed")
+    return proc.stdout.decode("utf-8", "surrogateescape")
+
+
+def git_changed_files(repo: str, rev_range: str, excludes=DEFAULT_EXCLUDES):
+    """(head commit, changed Dockerfile / compose paths) for `BASE..HEAD`, `BASE...HEAD` or a single commit.
+
+    Works on bare repositories: only trees are compared (git diff-tree), nothing is checked out.
+    A single commit is compared with its first parent; deleted files are left out.
+    """
+    base, sep, head = rev_range.partition("..")
+    if not sep:
+        base, head = "", base
+    elif head.startswith("."):
+        head = head[1:]
+        base = _git(repo, "merge-base", base or "HEAD", head or "HEAD").strip()
+    head = _git(repo, "rev-parse", "--verify", "--end-of-options", (head or "HEAD") + "^{commit}").strip()
+    if sep:
+        base = _git(repo, "rev-parse", "--verify", "--end-of-options", (base or "HEAD") + "^{commit}").strip()
+    elif len(_git(repo, "rev-list", "--parents", "-n", "1", head).split()) > 1:
+        base = head + "^"
+    else:
+        base = _git(repo, "hash-object", "-t", "tree", os.devnull).strip()  # root commit: diff against nothing
+    out = _git(repo, "diff-tree", "-r", "-z", "--name-only", "--diff-filter=ACMRT", base, head)
+    paths = []
+    for path in out.split("\0"):
+        parts = path.split("/")
+        if not path or "\n" in path or any(part in excludes for part in parts[:-1]):
+            continue
+        if is_dockerfile(parts[-1]) or is_composefile(parts[-1]):
+            paths.append(path)
+    return head, paths
+
+
+def iter_git_blobs(repo: str, rev: str, paths: List[str], max_size: int = DEFAULT_MAX_FILE_SIZE):
+    """Yields (path, text or ReadFailure) for `rev:path`, all through one `git cat-file --batch` process.
+
+    Requests are written from a helper thread while answers are read, so the pipe never stalls;
+    blobs larger than max_size are drained without being kept.
+    """
+    import subprocess
+
+    proc = subprocess.Popen(["git", "-C", repo, "cat-file", "--batch"], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def feed():
+        try:
+            for path in paths:
+                proc.stdin.write(f"{rev}:{path}\n".encode("utf-8", "surrogateescape"))
+            proc.stdin.close()
+        except OSError:
+            pass  # git exited early
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    out = proc.stdout
+    try:
+        for path in paths:
+            header = out.readline().split()
+            if len(header) != 3:  # "<object> missing" (or git died)
+                yield path, ReadFailure("unreadable", f"not found in {rev[:12]}")
+                continue
+            size = int(header[2])
+            if header[1] != b"blob" or (max_size and size > max_size):
+                remaining = size + 1  # including the trailing LF
+                while remaining > 0 and (chunk := out.read(min(remaining, 1 << 20))):
+                    remaining -= len(chunk)
+                yield path, (ReadFailure("too-large", f"{header[2].decode()} bytes") if header[1] == b"blob"
+                             else ReadFailure("unreadable", f"{header[1].decode()} object"))
+                continue
+            data = out.read(size)
+            out.read(1)  # the LF after every object
+            yield path, read_stream(io.BytesIO(data), size, max_size)
+    finally:
+        out.close()
+        writer.join()
+        proc.wait()
+
+
+# --- RESULT CACHE ---
+
+CACHE_FORMAT = 4
+DEFAULT_CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "docker-detective"
+
+
+def _file_digest(path: str) -> Optional[str]:
+    h = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class ResultCache:
+    """On-disk cache of per-file scan results for incremental rescans.
+
+    Entries are keyed by absolute path and validated by (mtime, size); when those changed
+    the content hash is compared before the entry is discarded, so a `touch` or a fresh
+    checkout does not force a rescan. The whole cache is dropped when the rule set
+    version changes. At most `max_entries` files are kept, least recently used are evicted first.
+    Safe to share between threads; with a save_interval, save() writes at most that often.
+    """
+
+    FILENAME = "results.json"
+
+    def __init__(self, ruleset_version: str, cache_dir: Optional[Path] = None, max_entries: int = 200_000,
+                 save_interval: float = 0.0, persist: bool = True):
+        self.ruleset_version = ruleset_version
+        self.persist = persist
+        self.path = Path(cache_dir or DEFAULT_CACHE_DIR) / self.FILENAME
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self.saved_at = 0.0
+        self.lock = threading.Lock()
+        self.entries: Dict[str, dict] = {}
+        self.generation = 0
+        self.dirty = False
+        if persist:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("format") != CACHE_FORMAT or data.get("ruleset") != self.ruleset_version:
+            return
+        self.entries = data.get("entries", {})
+        self.generation = data.get("generation", 0)
+
+    def get(self, filepath: Path) -> Optional[List[Issue]]:
+        """The cached issues, or None if there is no valid entry (see bases() for the entry's FROM images)."""
+        key = os.path.abspath(filepath)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(key)
+        except OSError:
+            return None
+        if entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            if entry["size"] != st.st_size or _file_digest(key) != entry["sha1"]:
+                return None
+            entry["mtime_ns"] = st.st_mtime_ns
+        entry["used"] = self.generation + 1
+        self.dirty = True
+        name = str(filepath)
+        return [Issue(sev, cat, name, line, content, msg, fix, rule_id)
+                for sev, cat, line, content, msg, fix, rule_id in entry["issues"]]
+
+    def bases(self, filepath: Path) -> Optional[List[list]]:
+        """Base images recorded with a Dockerfile's entry; only meaningful right after a get() hit."""
+        entry = self.entries.get(os.path.abspath(filepath))
+        return None if entry is None else entry.get("bases")
+
+    def put(self, filepath: Path, issues: List[Issue], stamp: tuple, bases: Optional[List[str]] = None):
+        """Stores the issues found in the content described by `stamp` (see read_source); the file is not re-read."""
+        key = os.path.abspath(filepath)
+        mtime_ns, size, digest = stamp
+        entry = {
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "sha1": digest,
+            "used": self.generation + 1,
+            "issues": [[i.severity, i.category, i.line_num, i.content, i.message, i.suggestion, i.rule_id]
+                       for i in issues],
+        }
+        if bases is not None:
+            entry["bases"] = bases
+        with self.lock:
+            self.entries[key] = entry
+            self.dirty = True
+
+    def save(self, force: bool = False):
+        if not self.persist or not self.dirty or (not force and time.monotonic() - self.saved_at < self.save_interval):
+            return
+        with self.lock:
+            self._save()
+            self.saved_at = time.monotonic()
+
+    def _save(self):
+        self.generation += 1
+        if len(self.entries) > self.max_entries:
+            keep = sorted(self.entries.items(), key=lambda kv: kv[1]["used"], reverse=True)[:self.max_entries]
+            self.entries = dict(keep)
+        data = {"format": CACHE_FORMAT, "ruleset": self.ruleset_version, "generation": self.generation,
+                "entries": self.entries}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            return
+        self.dirty = False
+
+
+def health_score(stats: Dict[str, int]) -> int:
+    """Health score (0-100) derived from the severity counters."""
+    score = 100 - (stats["critical"] * 15) - (stats["high"] * 5) - (stats["medium"] * 2)
+    return max(0, score)
+
+
+class ScannerEngine:
+    def __init__(self, rules: Optional[RuleSet] = None):
+        self.rules = rules or RuleSet()
+        self.issues = IssueStore()
+        self.scanned = set()  # files counted in stats["files_scanned"]
+        self.dockerfiles: List[Path] = []
+        self.composefiles: List[Path] = []
+        self.root_path = Path(".")
+        self.cache: Optional[ResultCache] = None
+        self.profiler: Optional[Profiler] = None
+        self.max_file_size = DEFAULT_MAX_FILE_SIZE
+        self.read_ahead = READ_AHEAD
+        self.skipped: Dict[str, ReadFailure] = {}  # files counted in stats["skipped"] / ["unreadable"]
+        self.compose_models: Dict[str, ComposeModel] = {}
+        self.base_images: Dict[str, List[list]] = {}  # Dockerfile -> base_images() of its last analysis
+        self.read_stamps: Dict[str, tuple] = {}  # file -> read_source() stamp of its last read, until cached
+        self.walk_stats: Dict[str, float] = {}
+        # Optional hook fired for every finding as soon as it is recorded (used by headless streaming)
+        self.on_issue: Optional[Callable[[Issue], None]] = None
+        self.stats = {
+            "critical": 0,
+            "high": 0,
+            "medium": 0,
+            "low": 0,
+            "files_scanned": 0,
+            "skipped": 0,
+            "unreadable": 0,
+            "cache_hits": 0,
+            "cache_misses": 0
+        }
+
+    def reset(self):
+        self.issues = IssueStore(self.root_path)
+        self.dockerfiles = []
+        self.composefiles = []
+        self._clear_results()
+
+    def _clear_results(self):
+        # parsed models and base images are per analysis: files may have changed since the last one
+        self.compose_models = {}
+        self.base_images = {}
+        self.issues = IssueStore(self.root_path)
+        self.scanned = set()
+        self.skipped = {}
+        self.read_stamps = {}
+        self.stats = {k: 0 for k in self.stats}
+
+    def spider_search(self, start_path: str, walker: Optional[SpiderWalker] = None):
+        """Recursively finds all Docker infrastructure files."""
+        self.root_path = Path(start_path)
+        self.reset()
+
+        walker = walker or SpiderWalker()
+        with _span(self.profiler, "discovery"):
+            self.dockerfiles, self.composefiles = walker.walk(start_path)
+        self.walk_stats = dict(walker.stats)
+
+    def select_shard(self, index: int, count: int):
+        """Keeps only the discovered files that belong to shard index/count (see shard_of)."""
+        def mine(path: Path) -> bool:
+            return shard_of(os.path.relpath(path, self.root_path), count) == index
+
+        self.dockerfiles = [p for p in self.dockerfiles if mine(p)]
+        self.composefiles = [p for p in self.composefiles if mine(p)]
+
+    def scan_archive(self, archive: str):
+        """Discovers and analyzes in one streaming pass over a tar archive (see iter_archive).
+
+        Members are reported as '<archive>!/<member>'; they are not cached and cannot be re-analyzed.
+        """
+        self.root_path = Path(archive).parent
+        self.reset()
+        with _span(self.profiler, "archive"):
+            for kind, name, payload in iter_archive(archive, self.max_file_size):
+                member = Path(f"{archive}!") / name
+                if kind == "image":
+                    self.dockerfiles.append(member)
+                    result = self.rules.evaluate("dockerfile", payload, member, self.profiler)
+                else:
+                    (self.dockerfiles if kind == "dockerfile" else self.composefiles).append(member)
+                    result = self.scan_file(kind, member, payload)
+                self._merge(member, result)
+
+    def scan_git(self, repo: str, head: str, paths: List[str]):
+        """Analyzes files of commit `head` straight from the object store (see git_changed_files).
+
+        Nothing is checked out, so this works on bare mirrors. Files are reported as
+        '<repo>/<commit>:<path>' (git's blob notation, short commit); like archive members they are not cached.
+        """
+        self.root_path = Path(repo)
+        self.reset()
+        with _span(self.profiler, "git"):
+            for path, text in iter_git_blobs(repo, head, paths, self.max_file_size):
+                name = Path(repo) / f"{head[:12]}:{path}"
+                kind = "dockerfile" if is_dockerfile(path.rsplit("/", 1)[-1]) else "compose"
+                (self.dockerfiles if kind == "dockerfile" else self.composefiles).append(name)
+                self._merge(name, self.scan_file(kind, name, text))
+
+    def scan_text(self, kind: str, filepath, text: str) -> List[Issue]:
+        """Analyzes in-memory content as if it were `filepath`; nothing is read from disk."""
+        if "\r" in text:
+            text = text.replace("\r\n", "\n").replace("\r", "\n")
+        path = Path(filepath)
+        (self.dockerfiles if kind == "dockerfile" else self.composefiles).append(path)
+        result = self.scan_file(kind, path, text)
+        self._merge(path, result)
+        return result
+
+    def scan_paths(self, paths):
+        """Analyzes explicitly named files instead of a crawled tree (compose if named *.yml / *.yaml)."""
+        self.root_path = Path(".")
+        self.reset()
+        for path in map(Path, paths):
+            compose = is_composefile(path.name) or path.suffix in (".yml", ".yaml")
+            (self.composefiles if compose else self.dockerfiles).append(path)
+        self.analyze_all(jobs=1)
+
+    def score(self) -> int:
+        return health_score(self.stats)
+
+    def analyze_all(self, jobs: int = 1, executor: str = "process"):
+        """Runs the deep scan on all found files.
+
+        With jobs > 1 the files are scanned by a worker pool ("process" or "thread").
+        Each file is scanned into its own result list and the results are merged in
+        discovery order, so issues and stats are identical to a serial run.
+        Files that are unchanged since the last run are served from self.cache.
+        Previous results are replaced, so running it again does not duplicate findings.
+        """
+        with _span(self.profiler, "analyze"):
+            self._analyze(jobs, executor)
+
+    def _analyze(self, jobs: int, executor: str):
+        self._clear_results()
+        if self.profiler is not None and executor == "process":
+            executor = "thread"  # worker processes cannot report into this profiler
+        work = [("dockerfile", df) for df in self.dockerfiles] + [("compose", cf) for cf in self.composefiles]
+        cached = [self._from_cache(path) if self.cache else None for _, path in work]
+        misses = [job for job, hit in zip(work, cached) if hit is None]
+        if self.cache:
+            self.stats["cache_hits"] += len(work) - len(misses)
+            self.stats["cache_misses"] += len(misses)
+
+        fresh = self._scan_many(misses, jobs or os.cpu_count() or 1, executor)
+        for (kind, path), result in zip(work, cached):
+            if result is None:
+                result = next(fresh)
+                stamp = self.read_stamps.pop(str(path), None)
+                if self.cache and stamp is not None and not isinstance(result, ReadFailure):
+                    self.cache.put(path, result, stamp, self.base_images.get(str(path)))
+            self._merge(path, result)
+        if self.cache:
+            self.cache.save()
+
+    def _from_cache(self, filepath: Path) -> Optional[List[Issue]]:
+        result = self.cache.get(filepath)
+        if result is not None:
+            bases = self.cache.bases(filepath)
+            if bases is not None:
+                self.base_images[str(filepath)] = bases
+        return result
+
+    def update_file(self, filepath: Path) -> List[Issue]:
+        """Re-analyzes one created or modified file in place and returns its new issues."""
+        key = str(filepath)
+        self.remove_file(filepath, forget=False)
+        self.compose_models.pop(key, None)
+        self.base_images.pop(key, None)
+        kind = "dockerfile" if is_dockerfile(filepath.name) else "compose"
+        files = self.dockerfiles if kind == "dockerfile" else self.composefiles
+        if filepath not in files:
+            bisect.insort(files, filepath)
+
+        result = self._from_cache(filepath) if self.cache else None
+        if result is None:
+            result = self.scan_file(kind, filepath)
+            stamp = self.read_stamps.pop(key, None)
+            if self.cache and stamp is not None and not isinstance(result, ReadFailure):
+                self.cache.put(filepath, result, stamp, self.base_images.get(key))
+        self._merge(filepath, result)
+        return [] if isinstance(result, ReadFailure) else result
+
+    def remove_file(self, filepath: Path, forget: bool = True):
+        """Drops a file's issues and counters (and, with forget, the file itself)."""
+        key = str(filepath)
+        for issue in self.issues.discard_file(key):
+            if issue.severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
+                self.stats[issue.severity.lower()] -= 1
+        if key in self.scanned:
+            self.scanned.discard(key)
+            self.stats["files_scanned"] -= 1
+        failure = self.skipped.pop(key, None)
+        if failure is not None:
+            self.stats["skipped" if failure.skipped else "unreadable"] -= 1
+        if forget:
+            self.compose_models.pop(key, None)
+            self.base_images.pop(key, None)
+            for files in (self.dockerfiles, self.composefiles):
+                if filepath in files:
+                    files.remove(filepath)
+
+    def _scan_many(self, work, jobs: int, executor: str):
+        """Yields scan results for `work` in order, serially or from a worker pool."""
+        if jobs <= 1 or len(work) < 2:
+            texts = prefetch(self.read_file, [path for _, path in work], self.read_ahead if len(work) > 1 else 0)
+            for (kind, path), text in zip(work, texts):
+                yield self.scan_file(kind, path, text)
+            return
+
+        if executor == "thread":
+            from concurrent.futures import ThreadPoolExecutor
+            pool = ThreadPoolExecutor(max_workers=jobs)
+            results = pool.map(self.scan_file, *zip(*work))
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=(self.rules.rules, self.max_file_size))
+            results = self._adopt_models(zip(work, pool.map(_scan_file_worker, work,
+                                                            chunksize=max(1, len(work) // (jobs * 8)))))
+        with pool:
+            yield from results
+
+    def _adopt_models(self, results):
+        for (kind, path), (result, model, bases, stamp) in results:
+            if model is not None:
+                self.compose_models[model.path] = model
+            if bases is not None:
+                self.base_images[str(path)] = bases
+            if stamp is not None:
+                self.read_stamps[str(path)] = stamp
+            yield result
+
+    def read_file(self, filepath: Path):
+        """The read stage: file text, or a ReadFailure if it is too large, binary or unreadable.
+
+        The stamp of what was read is kept in self.read_stamps until the result is cached.
+        """
+        with _span(self.profiler, "read", trace=False):
+            text, stamp = read_source(filepath, self.max_file_size)
+        if stamp is not None:
+            self.read_stamps[str(filepath)] = stamp
+        return text
+
+    def scan_file(self, kind: str, filepath: Path, text=None):
+        """Scans one file without touching shared state.
+
+        Returns its issues, or the ReadFailure if it was not analyzed. `text` is the
+        already prefetched read_file() result, if any.
+        """
+        scan = self._scan_dockerfile if kind == "dockerfile" else self._scan_compose
+        if self.profiler is None:
+            return scan(filepath, text)
+        started = time.perf_counter()
+        try:
+            return scan(filepath, text)
+        finally:
+            self.profiler.file(str(filepath), time.perf_counter() - started, started)
+
+    def _merge(self, filepath: Path, result):
+        if isinstance(result, ReadFailure):
+            self.skipped[str(filepath)] = result
+            self.stats["skipped" if result.skipped else "unreadable"] += 1
+            return
+        self.scanned.add(str(filepath))
+        self.stats["files_scanned"] += 1
+        for issue in result:
+            self._record(issue)
+
+    def add_issue(self, severity, category, filepath, line, content, msg, fix, rule_id=""):
+        self._record(Issue(severity, category, str(filepath), line, content, msg, fix, rule_id))
+
+    def _record(self, issue: Issue):
+        self.issues.append(issue)
+        if issue.severity in ["CRITICAL", "HIGH", "MEDIUM", "LOW"]:
+            self.stats[issue.severity.lower()] += 1
+        if self.on_issue is not None:
+            self.on_issue(issue)
+
+    def _scan_dockerfile(self, filepath: Path, text=None):
+        prof = self.profiler
+        if text is None:
+            text = self.read_file(filepath)
+        if isinstance(text, ReadFailure):
+            return text
+        with _span(prof, "parse", trace=False):
+            instructions = list(parse_dockerfile(io.StringIO(text).readlines()))
+        self.base_images[str(filepath)] = base_images(instructions)
+        with _span(prof, "evaluate", trace=False):
+            return self.rules.evaluate("dockerfile", instructions, filepath, prof)
+
+    def _scan_compose(self, filepath: Path, text=None):
+        model = self.compose_models.get(str(filepath))
+        if model is None:
+            if text is None:
+                text = self.read_file(filepath)
+            if isinstance(text, ReadFailure):
+                return text
+            model = self.compose_model(filepath, text)
+        if model.error:
+            return ReadFailure("unparsable", model.error)
+        with _span(self.profiler, "evaluate", trace=False):
+            return self.rules.evaluate("compose", model.entries, filepath, self.profiler)
+
+    def compose_model(self, filepath: Path, text: Optional[str] = None) -> Optional[ComposeModel]:
+        """Parsed compose file, read from disk at most once per session (shared by rules and topology).
+
+        None if the file could not be read (see read_file).
+        """
+        key = str(filepath)
+        model = self.compose_models.get(key)
+        if model is None:
+            if text is None:
+                text = self.read_file(filepath)
+                if isinstance(text, ReadFailure):
+                    return None
+            with _span(self.profiler, "parse", trace=False):
+                model = self.compose_models[key] = parse_compose(text, key)
+        return model
+
+
+def _init_worker(rules: List[Rule], max_file_size: int = DEFAULT_MAX_FILE_SIZE):
+    """Process-pool initializer: each worker process scans with its own engine and the parent's rules."""
+    global _worker_engine
+    _worker_engine = ScannerEngine(RuleSet(rules))
+    _worker_engine.max_file_size = max_file_size
+
+
+def _scan_file_worker(job):
+    """Returns the result plus the compose model, base images and read stamp, so the parent does not re-read the file."""
+    kind, path = job
+    result = _worker_engine.scan_file(kind, path)
+    return (result, _worker_engine.compose_models.pop(str(path), None),
+            _worker_engine.base_images.pop(str(path), None), _worker_engine.read_stamps.pop(str(path), None))
+
+
+_worker_engine: Optional["ScannerEngine"] = None
+
+
+# --- REPORT WRITER ---
+
+REPORT_FORMATS = ("html", "jsonl", "csv")
+REPORT_COLUMNS = ["severity", "category", "filepath", "line_num", "content", "message", "suggestion", "rule_id"]
+
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>DevOps Security Audit Report</title>
+    <style>
+        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #1e1e1e; color: #e0e0e0; margin: 0; padding: 20px; }}
+        .container {{ max-width: 1200px; margin: 0 auto; }}
+        .header {{ display: flex; justify-content: space-between; align-items: center; border-bottom: 2px solid #333; padding-bottom: 20px; margin-bottom: 30px; }}
+        .logo h1 {{ margin: 0; color: #00bcd4; text-transform: uppercase; letter-spacing: 2px; }}
+        .score-card {{ text-align: right; }}
+        .score-circle {{ display: inline-block; width: 60px; height: 60px; border-radius: 50%; background: {score_color}; color: white; text-align: center; line-height: 60px; font-weight: bold; font-size: 24px; }}
+        .metrics-grid {{ display: grid; grid-template-columns: repeat(4, 1fr); gap: 20px; margin-bottom: 30px; }}
+        .metric-box {{ background: #252526; padding: 20px; border-radius: 8px; text-align: center; border: 1px solid #333; }}
+        .metric-count {{ font-size: 36px; font-weight: bold; margin-bottom: 5px; }}
+
+        /* COLORS */
+        .critical-text {{ color: #dc3545; }} 
+        .high-text {{ color: #fd7e14; }} 
+        .medium-text {{ color: #ffc107; }} 
+        .low-text {{ color: #0dcaf0; }}
+
+        table {{ width: 100%; border-collapse: collapse; background: #252526; border-radius: 8px; overflow: hidden; }}
+        th, td {{ padding: 15px; text-align: left; border-bottom: 1px solid #333; }}
+        th {{ background: #333; color: #fff; text-transform: uppercase; font-size: 12px; letter-spacing: 1px; }}
+        tr:hover {{ background: #2a2d2e; }}
+
+        .badge {{ padding: 5px 10px; border-radius: 4px; font-size: 12px; font-weight: bold; color: white; }}
+        .badge.critical {{ background: #dc3545; }} /* Red */
+        .badge.high {{ background: #fd7e14; }}     /* Orange */
+        .badge.medium {{ background: #ffc107; color: black; }} /* Yellow */
+        .badge.low {{ background: #0dcaf0; color: black; }}    /* Blue */
+
+        .location {{ font-family: monospace; color: #bbb; }}
+        .fix-code {{ font-family: 'Consolas', monospace; color: #a6e22e; background: #111; padding: 5px 10px; border-radius: 4px; }}
+        .footer {{ margin-top: 50px; text-align: center; color: #666; font-size: 12px; }}
+
+        /* TRENDS (from the scan history) */
+        .trends {{ display: grid; grid-template-columns: repeat(2, 1fr); gap: 20px; margin-bottom: 30px; }}
+        .chart {{ background: #252526; padding: 15px; border-radius: 8px; border: 1px solid #333; }}
+        .chart svg {{ width: 100%; height: 160px; }}
+        .chart-title {{ font-weight: bold; margin-bottom: 10px; }}
+        .chart-axis {{ display: flex; justify-content: space-between; color: #888; font-size: 12px; }}
+        .legend {{ font-weight: normal; font-size: 12px; margin-left: 10px; }}
+        .trend-table {{ grid-column: 1 / -1; }}
+        .spark {{ width: 120px; height: 24px; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <div class="logo">
+                <h1>The Architect's Console</h1>
+                <p>Infrastructure Security Audit</p>
+            </div>
+            <div class="score-card">
+                <span>System Health Score</span>
+                <div class="score-circle">{score}</div>
+            </div>
+        </div>
+
+        <div class="metrics-grid">
+            <div class="metric-box">
+                <div class="metric-count critical-text">{critical}</div>
+                <div>Critical</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-count high-text">{high}</div>
+                <div>High</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-count medium-text">{medium}</div>
+                <div>Medium</div>
+            </div>
+            <div class="metric-box">
+                <div class="metric-count low-text">{low}</div>
+                <div>Low</div>
+            </div>
+        </div>
+{trends}
+        <table>
+            <thead>
+                <tr>
+                    <th>Severity</th>
+                    <th>Category</th>
+                    <th>File Location</th>
+                    <th>Issue Detected</th>
+                    <th>Recommended Fix</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+
+HTML_ROW = """
+    <tr>
+        <td><span class="badge {color_class}">{severity}</span></td>
+        <td>{category}</td>
+        <td class="location">{location}</td>
+        <td>{message}</td>
+        <td class="fix-code">{suggestion}</td>
+    </tr>
+"""
+
+HTML_FOOT = """            </tbody>
+        </table>
+
+        <div class="footer">
+            Generated by DevOps Architect Console • {generated}
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def report_format(path: str) -> str:
+    """Report format implied by a file extension (html by default)."""
+    ext = Path(path).suffix.lower().lstrip(".")
+    return {"ndjson": "jsonl", "htm": "html"}.get(ext, ext) if ext in REPORT_FORMATS + ("ndjson", "htm") else "html"
+
+
+def _html_rows(issues, rel):
+    import html
+
+    esc = html.escape
+    for issue in issues:
+        color_class = issue.severity.lower() if issue.severity in ("CRITICAL", "HIGH", "MEDIUM") else "low"
+        yield HTML_ROW.format(
+            color_class=color_class,
+            severity=esc(issue.severity),
+            category=esc(issue.category),
+            location=esc(f"{rel(issue.filepath)}:{issue.line_num}"),
+            message=esc(issue.message),
+            suggestion=esc(issue.suggestion),
+        )
+
+
+def write_report(scan: "ScannerEngine", path: str, fmt: str = "html", chunk: int = 512, trends: str = ""):
+    """Streams the scan results to `path`.
+
+    Rows are produced by a generator over the store's severity-ordered view and flushed in
+    chunks, so memory stays bounded no matter how many findings there are. `trends` is an
+    HTML fragment placed above the findings table (see history.trend_html).
+    """
+    write_issue_report(path, scan.issues.by_severity_sorted(), scan.stats, fmt, scan.issues.rel, chunk, trends)
+
+
+def write_issue_report(path: str, issues, stats: Dict[str, int], fmt: str = "html",
+                       rel: Callable[[str], str] = str, chunk: int = 512, trends: str = ""):
+    """write_report() for any severity-ordered iterable of issues (e.g. a PartialMerge)."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            import csv
+
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows([i.severity, i.category, rel(i.filepath), i.line_num, i.content, i.message,
+                              i.suggestion, i.rule_id] for i in issues)
+            return
+        if fmt == "jsonl":
+            rows = (json.dumps(dict(asdict(i), filepath=rel(i.filepath))) + "\n" for i in issues)
+        else:
+            score = health_score(stats)
+            score_color = "#28a745" if score > 80 else "#ffc107" if score > 50 else "#dc3545"
+            f.write(HTML_HEAD.format(score=score, score_color=score_color, critical=stats["critical"],
+                                     high=stats["high"], medium=stats["medium"], low=stats["low"], trends=trends))
+            rows = _html_rows(issues, rel)
+        while True:
+            block = list(itertools.islice(rows, chunk))
+            if not block:
+                break
+            f.write("".join(block))
+        if fmt == "html":
+            f.write(HTML_FOOT.format(generated=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+
+# --- BASELINE ---
+
+class Baseline:
+    """Fingerprints of accepted findings, used to report only what is new (or fixed) since.
+
+    A fingerprint is rule id + root-relative path + whitespace-normalized content; the line
+    number is left out so findings survive lines shifting. Identical findings in one file
+    are counted, so the comparison is a multiset difference done with hash lookups.
+    """
+
+    FORMAT = 1
+
+    def __init__(self, entries: Optional[Dict[str, list]] = None):
+        self.entries = entries or {}  # fingerprint -> [rule_id, path, severity, count]
+
+    @staticmethod
+    def fingerprint(issue: Issue, rel_path: str) -> str:
+        key = "\0".join((_rule_id(issue), rel_path.replace(os.sep, "/"), " ".join(issue.content.split())))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+    @classmethod
+    def from_issues(cls, issues: IssueStore) -> "Baseline":
+        entries: Dict[str, list] = {}
+        for issue in issues:
+            rel_path = issues.rel(issue.filepath)
+            fp = cls.fingerprint(issue, rel_path)
+            if fp in entries:
+                entries[fp][3] += 1
+            else:
+                entries[fp] = [_rule_id(issue), rel_path.replace(os.sep, "/"), issue.severity, 1]
+        return cls(entries)
+
+    @classmethod
+    def load(cls, path) -> "Baseline":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != cls.FORMAT:
+            raise ValueError(f"{path}: unsupported baseline format")
+        return cls(data["findings"])
+
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": self.FORMAT, "findings": self.entries}, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def diff(self, rel) -> "BaselineDiff":
+        return BaselineDiff(self, rel)
+
+
+class BaselineDiff:
+    """Streaming comparison: feed issues to is_new() as they are found, then ask for fixed()."""
+
+    def __init__(self, baseline: Baseline, rel: Callable[[str], str]):
+        self.baseline = baseline
+        self.rel = rel
+        self.remaining = {fp: entry[3] for fp, entry in baseline.entries.items()}
+        self.new = 0
+
+    def is_new(self, issue: Issue) -> bool:
+        fp = Baseline.fingerprint(issue, self.rel(issue.filepath))
+        left = self.remaining.get(fp, 0)
+        if left:
+            self.remaining[fp] = left - 1
+            return False
+        self.new += 1
+        return True
+
+    def fixed(self) -> List[dict]:
+        """Baseline findings that no longer occur."""
+        out = []
+        for fp, left in self.remaining.items():
+            if left:
+                rule_id, path, severity, _ = self.baseline.entries[fp]
+                out.append({"fingerprint": fp, "rule_id": rule_id, "filepath": path, "severity": severity,
+                            "count": left})
+        return out
+
+
+# --- FIX ENGINE ---
+
+_EOL_RE = re.compile(r"(\r\n|\r|\n)")
+
+
+@dataclass
+class FileFix:
+    """The rewrite of one file, with every fixable finding applied in a single pass."""
+    filepath: str
+    original: str
+    fixed: str
+    applied: List[Issue]  # findings a rewrite was made for
+    unfixed: List[Issue]  # the rule has a fix, but it does not apply to this case
+    remaining: List[Issue] = field(default_factory=list)  # applied, yet still reported after re-analysis
+    written: bool = False
+
+
+def fix_file(rules: RuleSet, filepath, issues: List[Issue], options: Optional[dict] = None,
+             max_size: int = DEFAULT_MAX_FILE_SIZE) -> Optional[FileFix]:
+    """Applies the rewrites of all fixable `issues` of one file to its current content.
+
+    Findings are grouped per unit (a Dockerfile instruction with its continuation lines, or a
+    compose line) and units are rewritten bottom-up, so several fixes to one RUN or one file
+    land together. Line endings are kept. None if nothing is fixable or the file cannot be read.
+    """
+    fixable = [(issue, rules.get(issue.rule_id)) for issue in issues]
+    fixable = [(issue, rule) for issue, rule in fixable if rule is not None and rule.fix is not None]
+    if not fixable:
+        return None
+    try:
+        with open(filepath, "rb") as f:
+            data = f.read(max_size + 1 if max_size else -1)
+        original = data.decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+    if max_size and len(data) > max_size:
+        return None
+
+    parts = _EOL_RE.split(original)
+    lines, ends = parts[0::2], parts[1::2] + [""]
+    if is_dockerfile(Path(filepath).name):
+        spans = {ins.start_line: ins.end_line for ins in parse_dockerfile(lines)}
+    else:
+        spans = {}
+    units: Dict[int, list] = {}
+    for issue, rule in fixable:
+        units.setdefault(issue.line_num, []).append((issue, rule))
+
+    applied, unfixed = [], []
+    for start in sorted(units, reverse=True):
+        end = spans.get(start, start)
+        if not 1 <= start <= end <= len(lines):
+            unfixed.extend(issue for issue, _ in units[start])
+            continue
+        chunk = lines[start - 1:end]
+        for issue, rule in sorted(units[start], key=lambda pair: pair[1].id):
+            new = rule.fix(chunk, issue, options or {})
+            if new is None or new == chunk:
+                unfixed.append(issue)
+            else:
+                chunk = new
+                applied.append(issue)
+        if chunk != lines[start - 1:end]:
+            eol = ends[start - 1] or "\n"
+            lines[start - 1:end] = chunk
+            ends[start - 1:end] = [eol] * (len(chunk) - 1) + [ends[end - 1]] if chunk else []
+    fixed = "".join(line + eol for line, eol in zip(lines, ends))
+    return FileFix(str(filepath), original, fixed, applied[::-1], unfixed)
+
+
+def recheck_fix(rules: RuleSet, fix: FileFix) -> List[Issue]:
+    """Analyzes the fixed content in memory and returns the applied findings that are still reported."""
+    text = fix.fixed.replace("\r\n", "\n").replace("\r", "\n")
+    if is_dockerfile(Path(fix.filepath).name):
+        found = rules.evaluate("dockerfile", list(parse_dockerfile(io.StringIO(text).readlines())), fix.filepath)
+    else:
+        found = rules.evaluate("compose", parse_compose(text, fix.filepath).entries, fix.filepath)
+    return _still_reported(fix.applied, found)
+
+
+def _still_reported(applied: List[Issue], found: List[Issue]) -> List[Issue]:
+    # the built-in rewrites keep line numbers, so a finding is identified by rule and line
+    left = collections.Counter((issue.rule_id, issue.line_num) for issue in found)
+    return [issue for issue in applied if left[issue.rule_id, issue.line_num]]
+
+
+def plan_fixes(scan: "ScannerEngine", options: Optional[dict] = None, rule_ids=None, workers: int = READ_AHEAD):
+    """Yields a FileFix for every analyzed file with something to fix, in file order.
+
+    Files are read, rewritten and re-checked by `workers` threads ahead of the consumer (see
+    prefetch), so a caller can stream the patch while later files are still being processed.
+    """
+    def plan(filepath: str) -> Optional[FileFix]:
+        issues = [i for i in scan.issues.for_file(filepath) if rule_ids is None or i.rule_id in rule_ids]
+        fix = fix_file(scan.rules, filepath, issues, options, scan.max_file_size)
+        if fix is not None and fix.applied:
+            fix.remaining = recheck_fix(scan.rules, fix)
+        return fix
+
+    files = sorted(f for f in scan.issues.files() if f in scan.scanned)
+    for fix in prefetch(plan, files, workers):
+        if fix is not None and (fix.applied or fix.unfixed):
+            yield fix
+
+
+def _keepends(text: str) -> List[str]:
+    parts = _EOL_RE.split(text)
+    lines = [line + eol for line, eol in zip(parts[0::2], parts[1::2])]
+    return lines + [parts[-1]] if parts[-1] else lines
+
+
+def unified_diff(fix: FileFix, rel_path: str) -> str:
+    """The fix as a `git apply` / `patch -p1` compatible unified diff (empty if nothing changed)."""
+    import difflib
+
+    rel_path = rel_path.replace(os.sep, "/")
+    out = []
+    for line in difflib.unified_diff(_keepends(fix.original), _keepends(fix.fixed), f"a/{rel_path}", f"b/{rel_path}"):
+        out.append(line if line.endswith(("\n", "\r")) else line + "\n\\ No newline at end of file\n")
+    return "".join(out)
+
+
+def apply_fix(fix: FileFix) -> bool:
+    """Atomically replaces the file with its fixed content (same directory temp file + rename).
+
+    Refuses (returns False) when the file changed since it was read.
+    """
+    try:
+        with open(fix.filepath, "rb") as f:
+            if f.read() != fix.original.encode("utf-8"):
+                return False
+            mode = os.fstat(f.fileno()).st_mode & 0o7777
+        directory, name = os.path.split(os.path.abspath(fix.filepath))
+        import tempfile
+
+        fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".fix", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(fix.fixed.encode("utf-8"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, mode)
+            os.replace(tmp, fix.filepath)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    except OSError:
+        return False
+    fix.written = True
+    return True
+
+
+def reanalyze_fixed(scan: "ScannerEngine", fix: FileFix) -> List[Issue]:
+    """After apply_fix(): re-analyzes only that file (see update_file); returns applied findings still reported."""
+    fix.remaining = _still_reported(fix.applied, scan.update_file(Path(fix.filepath)))
+    return fix.remaining
+
+
+# --- DEPENDENCY GRAPH ---
+
+GRAPH_INHERIT = ("build", "image", "from", "built_by")  # edges along which findings are inherited
+# "build_from" (a builder stage's base) is shown but not inherited: the shipped image does not contain it
+
+
+def _image_ref(ref: str) -> str:
+    """Normalizes an image reference so `nginx`, `nginx:latest` and `docker.io/library/nginx` meet."""
+    ref = ref.strip()
+    for prefix in ("docker.io/library/", "index.docker.io/library/", "docker.io/"):
+        if ref.startswith(prefix):
+            ref = ref[len(prefix):]
+            break
+    if "@" not in ref and ":" not in ref.rsplit("/", 1)[-1]:
+        ref += ":latest"
+    return ref
+
+
+@dataclass
+class GraphNode:
+    id: str
+    kind: str  # service / dockerfile / image / network / volume
+    label: str
+    path: str = ""  # source file (services, dockerfiles)
+    findings: List[Issue] = field(default_factory=list)  # found in this node itself
+
+
+class ProjectGraph:
+    """Project-wide links: compose services -> Dockerfiles -> base images -> the Dockerfiles that build them.
+
+    Built from an analyzed ScannerEngine, so every file is analyzed once; a node's inherited
+    findings are the own findings of everything it reaches along GRAPH_INHERIT edges, and the
+    reachable set is computed once per node and reused by all of its dependents.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, GraphNode] = {}
+        self.edges: List[tuple] = []  # (src, dst, kind)
+        self.out: Dict[str, List[tuple]] = {}
+        self.into: Dict[str, List[tuple]] = {}
+        self._ancestors: Dict[str, frozenset] = {}
+
+    def node(self, node_id: str, kind: str, label: str, path: str = "") -> GraphNode:
+        node = self.nodes.get(node_id)
+        if node is None:
+            node = self.nodes[node_id] = GraphNode(node_id, kind, label, path)
+        return node
+
+    def edge(self, src: str, dst: str, kind: str):
+        if (dst, kind) not in self.out.setdefault(src, []):
+            self.out[src].append((dst, kind))
+            self.into.setdefault(dst, []).append((src, kind))
+            self.edges.append((src, dst, kind))
+            self._ancestors.clear()
+
+    @classmethod
+    def build(cls, scan: "ScannerEngine", image_map: Optional[Dict[str, str]] = None) -> "ProjectGraph":
+        """`image_map` names extra image tags built from a Dockerfile (tag -> path), next to compose build+image."""
+        graph = cls()
+        rel = scan.issues.rel
+        dockerfiles = {os.path.abspath(p): p for p in scan.dockerfiles}
+
+        def dockerfile_node(path: str) -> str:
+            node_id = "dockerfile:" + rel(path)
+            graph.node(node_id, "dockerfile", rel(path), path)
+            return node_id
+
+        for path in scan.dockerfiles:
+            node_id = dockerfile_node(str(path))
+            graph.nodes[node_id].findings = list(scan.issues.for_file(str(path)))
+            for base, kind in scan.base_images.get(str(path), ()):
+                ref = _image_ref(base)
+                graph.node("image:" + ref, "image", ref)
+                graph.edge(node_id, "image:" + ref, kind)
+
+        for tag, path in (image_map or {}).items():
+            ref = _image_ref(tag)
+            graph.node("image:" + ref, "image", ref)
+            graph.edge("image:" + ref, dockerfile_node(os.path.abspath(path)), "built_by")
+
+        for cf in scan.composefiles:
+            model = scan.compose_model(cf)
+            if model is None or model.error:
+                continue
+            project = rel(str(cf))
+            base_dir = os.path.dirname(os.path.abspath(cf))
+            issues = scan.issues.for_file(str(cf))
+            for svc in model.services:
+                svc_id = f"service:{project}#{svc.name}"
+                node = graph.node(svc_id, "service", svc.name, str(cf))
+                lines = {e.line for e in svc.entries} | {svc.line}
+                node.findings = [i for i in issues if i.line_num in lines]
+                if svc.build and "://" not in svc.build and not svc.build.startswith("git@"):
+                    path = os.path.normpath(os.path.join(base_dir, svc.build, svc.dockerfile or "Dockerfile"))
+                    df_id = dockerfile_node(str(dockerfiles.get(path, path)))
+                    graph.edge(svc_id, df_id, "build")
+                    if svc.image:
+                        ref = _image_ref(svc.image)
+                        graph.node("image:" + ref, "image", ref)
+                        graph.edge("image:" + ref, df_id, "built_by")
+                elif svc.image:
+                    ref = _image_ref(svc.image)
+                    graph.node("image:" + ref, "image", ref)
+                    graph.edge(svc_id, "image:" + ref, "image")
+                for dep in svc.depends_on:
+                    graph.edge(svc_id, f"service:{project}#{dep}", "depends_on")
+                for net in svc.networks or ["default"]:
+                    graph.node(f"network:{project}#{net}", "network", net)
+                    graph.edge(svc_id, f"network:{project}#{net}", "network")
+                for volume in svc.volumes:
+                    source = volume.split(":", 1)[0] if ":" in volume else ""
+                    if not source:
+                        continue  # anonymous volume
+                    if source.startswith(("/", ".", "~", "$")):
+                        vol_id = "volume:host:" + source
+                    else:
+                        vol_id = f"volume:{project}#{source}"
+                    graph.node(vol_id, "volume", source)
+                    graph.edge(svc_id, vol_id, "volume")
+        return graph
+
+    def ancestors(self, node_id: str) -> frozenset:
+        """Everything `node_id` inherits from (transitively, along GRAPH_INHERIT edges)."""
+        done = self._ancestors.get(node_id)
+        if done is not None:
+            return done
+        self._ancestors[node_id] = frozenset()  # cycle guard
+        found = set()
+        for dst, kind in self.out.get(node_id, ()):
+            if kind in GRAPH_INHERIT:
+                found.add(dst)
+                found.update(self.ancestors(dst))
+        found.discard(node_id)
+        result = self._ancestors[node_id] = frozenset(found)
+        return result
+
+    def inherited(self, node_id: str) -> List[tuple]:
+        """(origin node id, issue) for every finding inherited from an ancestor."""
+        return [(origin, issue) for origin in sorted(self.ancestors(node_id))
+                for issue in self.nodes[origin].findings]
+
+    def dependents(self, node_id: str, kind: Optional[str] = None) -> List[str]:
+        """Nodes that inherit from `node_id` (optionally only services, dockerfiles, ...)."""
+        seen, stack = set(), [node_id]
+        while stack:
+            for src, edge_kind in self.into.get(stack.pop(), ()):
+                if edge_kind in GRAPH_INHERIT and src not in seen:
+                    seen.add(src)
+                    stack.append(src)
+        seen.discard(node_id)
+        return sorted(n for n in seen if kind is None or self.nodes[n].kind == kind)
+
+    def find(self, name: str) -> Optional[str]:
+        """Node id for an id, a root-relative file, a service name or an image reference."""
+        if name in self.nodes:
+            return name
+        for prefix in ("dockerfile:", "image:"):
+            candidate = prefix + (_image_ref(name) if prefix == "image:" else name)
+            if candidate in self.nodes:
+                return candidate
+        matches = [n.id for n in self.nodes.values() if n.kind == "service" and n.label == name]
+        return matches[0] if len(matches) == 1 else None
+
+    def affected(self, severity: Optional[str] = None, rule_id: Optional[str] = None,
+                 origin: Optional[str] = None) -> List[dict]:
+        """For each matching finding: the services and Dockerfiles that inherit it."""
+        out = []
+        for node in self.nodes.values():
+            if origin is not None and node.id != origin:
+                continue
+            for issue in node.findings:
+                if (severity and issue.severity != severity) or (rule_id and issue.rule_id != rule_id):
+                    continue
+                out.append({
+                    "origin": node.id, "line_num": issue.line_num, "severity": issue.severity,
+                    "rule_id": issue.rule_id, "message": issue.message,
+                    "services": self.dependents(node.id, "service"),
+                    "dockerfiles": self.dependents(node.id, "dockerfile"),
+                })
+        return out
+
+    @staticmethod
+    def severity_counts(issues) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for issue in issues:
+            counts[issue.severity] = counts.get(issue.severity, 0) + 1
+        return dict(sorted(counts.items(), key=lambda kv: SEVERITY_ORDER.get(kv[0], 99)))
+
+    def to_json(self) -> dict:
+        return {
+            "nodes": [{"id": n.id, "kind": n.kind, "label": n.label, "findings": self.severity_counts(n.findings),
+                       "inherited": self.severity_counts(issue for _, issue in self.inherited(n.id))}
+                      for n in self.nodes.values()],
+            "edges": [{"from": src, "to": dst, "kind": kind} for src, dst, kind in self.edges],
+        }
+
+    def to_dot(self) -> str:
+        shapes = {"service": "box", "dockerfile": "note", "image": "ellipse", "network": "hexagon",
+                  "volume": "cylinder"}
+        lines = ["digraph project {", "  rankdir=LR;", '  node [fontname="Helvetica"];']
+        for n in self.nodes.values():
+            own = self.severity_counts(n.findings)
+            inherited = self.severity_counts(issue for _, issue in self.inherited(n.id))
+            label = n.label + "".join(f"\n{kind}: " + " ".join(f"{sev[0]}{count}" for sev, count in counts.items())
+                                      for kind, counts in (("own", own), ("inherited", inherited)) if counts)
+            color = "red" if "CRITICAL" in own or "CRITICAL" in inherited else "black"
+            lines.append(f"  {json.dumps(n.id)} [label={json.dumps(label)}, shape={shapes[n.kind]}, color={color}];")
+        for src, dst, kind in self.edges:
+            style = "solid" if kind in GRAPH_INHERIT else "dashed"
+            lines.append(f"  {json.dumps(src)} -> {json.dumps(dst)} [label={json.dumps(kind)}, style={style}];")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+
+# --- WATCH MODE ---
+
+class InotifyWatcher:
+    """Minimal Linux inotify binding (ctypes, no extra dependency)."""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        import ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches: Dict[int, str] = {}
+
+    def add(self, directory: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd >= 0:
+            self.watches[wd] = directory
+
+    def read(self, timeout: float):
+        """Returns [(path, is_dir, kind)] with kind 'changed', 'deleted' or 'overflow'."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    events.append(("", False, "overflow"))
+                    continue
+                if mask & self.IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                kind = "deleted" if mask & (self.IN_DELETE | self.IN_MOVED_FROM) else "changed"
+                events.append((os.path.join(directory, name), bool(mask & self.IN_ISDIR), kind))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Portable fallback: re-crawls the tree and diffs (mtime, size) of infrastructure files."""
+
+    def __init__(self, walker: "SpiderWalker", root: str, interval: float = 1.0):
+        self.walker = walker
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._take()
+
+    def _take(self) -> Dict[str, tuple]:
+        dockerfiles, composefiles = self.walker.walk(self.root)
+        snap = {}
+        for p in dockerfiles + composefiles:
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            snap[str(p)] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def add(self, directory: str):
+        pass
+
+    def read(self, timeout: float):
+        time.sleep(max(timeout, self.interval))
+        current = self._take()
+        events = [(p, False, "changed") for p, sig in current.items() if self.snapshot.get(p) != sig]
+        events += [(p, False, "deleted") for p in self.snapshot if p not in current]
+        self.snapshot = current
+        return events
+
+    def close(self):
+        pass
+
+
+class WatchSession:
+    """Keeps engine results current by re-analyzing only files touched on disk."""
+
+    def __init__(self, scan: "ScannerEngine", root: str, walker: "SpiderWalker", polling: bool = False,
+                 interval: float = 1.0, debounce: float = 0.1):
+        self.engine = scan
+        self.root = root
+        self.walker = walker
+        self.debounce = debounce
+        scan.spider_search(root, walker)
+        scan.analyze_all()
+        self.last_duration = 0.0  # seconds spent applying the last batch of events
+        self.watcher = None
+        if not polling:
+            try:
+                self.watcher = InotifyWatcher()
+            except (OSError, AttributeError):
+                self.watcher = None
+        if self.watcher is None:
+            self.watcher = PollingWatcher(walker, root, interval)
+        for directory in walker.directories:
+            self.watcher.add(directory)
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if isinstance(self.watcher, InotifyWatcher) else "polling"
+
+    def poll(self, timeout: float = 1.0) -> Dict[str, str]:
+        """Waits for filesystem events and applies them. Returns {path: 'updated'|'removed'}."""
+        events = self.watcher.read(timeout)
+        if not events:
+            return {}
+        if self.debounce and isinstance(self.watcher, InotifyWatcher):
+            # Editors write in several steps; coalesce the burst
+            time.sleep(self.debounce)
+            events += self.watcher.read(0)
+        started = time.perf_counter()
+        try:
+            return self._apply(events)
+        finally:
+            self.last_duration = time.perf_counter() - started
+
+    def _apply(self, events) -> Dict[str, str]:
+        if any(kind == "overflow" for _, _, kind in events):
+            self.engine.spider_search(self.root, self.walker)
+            self.engine.analyze_all()
+            for directory in self.walker.directories:
+                self.watcher.add(directory)
+            return {"*": "rescanned"}
+
+        latest: Dict[str, tuple] = {}
+        for path, is_dir, kind in events:
+            latest[path] = (is_dir, kind)
+
+        changes: Dict[str, str] = {}
+        for path, (is_dir, kind) in latest.items():
+            if is_dir:
+                changes.update(self._directory_event(path, kind))
+                continue
+            name = os.path.basename(path)
+            if not (is_dockerfile(name) or is_composefile(name)):
+                continue
+            filepath = Path(path)
+            if kind == "deleted" or not os.path.isfile(path):
+                self.engine.remove_file(filepath)
+                changes[path] = "removed"
+            else:
+                self.engine.update_file(filepath)
+                changes[path] = "updated"
+        if changes and self.engine.cache:
+            self.engine.cache.save()
+        return changes
+
+    def _directory_event(self, path: str, kind: str) -> Dict[str, str]:
+        changes = {}
+        prefix = path + os.sep
+        if kind == "deleted":
+            for filepath in [p for p in self.engine.dockerfiles + self.engine.composefiles if str(p).startswith(prefix)]:
+                self.engine.remove_file(filepath)
+                changes[str(filepath)] = "removed"
+            return changes
+        if self.walker._excluded(os.path.basename(path)):
+            return changes
+        # New (or moved-in) directory: watch it and pick up the files it already contains
+        sub = SpiderWalker(self.walker.excludes, self.walker.use_ignore_files)
+        dockerfiles, composefiles = sub.walk(path)
+        for directory in sub.directories:
+            self.watcher.add(directory)
+        for filepath in dockerfiles + composefiles:
+            self.engine.update_file(filepath)
+            changes[str(filepath)] = "updated"
+        return changes
+
+    def close(self):
+        self.watcher.close()
+
+
+# --- BENCHMARK ---
+
+BENCH_CLEAN_LINES = [
+    "RUN echo building",
+    "COPY . /app",
+    "WORKDIR /app",
+    "ENV APP_ENV=production",
+    "RUN apk add --no-cache curl",
+    "RUN pip install --no-cache-dir -r requirements.txt",
+    "LABEL maintainer=team",
+]
+BENCH_ISSUE_LINES = [
+    "RUN sudo make install",
+    "RUN apk add curl",
+    "RUN apt-get install -y build-essential",
+    "RUN pip install flask",
+    "EXPOSE 22",
+    "ENV AWS_ACCESS_KEY=AKIAEXAMPLE",
+]
+
+
+def generate_corpus(root: str, files: int = 1000, lines: int = 40, depth: int = 4, density: float = 0.2,
+                    ignored: int = 200, compose_ratio: float = 0.25, seed: int = 42) -> Dict[str, int]:
+    """Writes a deterministic synthetic tree of Dockerfiles and compose files.
+
+    `density` is the share of lines that trigger a rule; `ignored` extra Dockerfiles are
+    placed under node_modules/.git subtrees that discovery must skip.
+    """
+    import random
+
+    rnd = random.Random(seed)
+    written = {"dockerfiles": 0, "composefiles": 0, "ignored": 0, "lines": 0}
+
+    def folder(i: int) -> str:
+        parts = [f"d{(i >> (3 * level)) % 8}" for level in range(rnd.randint(1, max(1, depth)))]
+        return os.path.join(root, f"svc{i % 97}", *parts, f"app{i}")
+
+    def dockerfile_text() -> str:
+        body = [f"FROM python:3.{rnd.randint(8, 12)}-slim"]
+        for _ in range(max(0, lines - 1)):
+            pool = BENCH_ISSUE_LINES if rnd.random() < density else BENCH_CLEAN_LINES
+            body.append(rnd.choice(pool))
+        if rnd.random() > density:
+            body.append("USER app")
+        return "\n".join(body) + "\n"
+
+    def compose_text() -> str:
+        out = ["services:"]
+        for n in range(max(1, lines // 8)):
+            out.append(f"  app{n}:")
+            out.append(f"    image: registry.local/app{n}:{'latest' if rnd.random() < density else '1.0.' + str(n)}")
+            if rnd.random() < density:
+                out.append("    privileged: true")
+            out.append("    environment:")
+            out.append(f"      - {'DB_PASSWORD=secret' if rnd.random() < density else 'LOG_LEVEL=info'}")
+        return "\n".join(out) + "\n"
+
+    for i in range(files):
+        directory = folder(i)
+        os.makedirs(directory, exist_ok=True)
+        if rnd.random() < compose_ratio:
+            text, name, key = compose_text(), "docker-compose.yml", "composefiles"
+        else:
+            text, name, key = dockerfile_text(), "Dockerfile" if i % 3 else f"worker{i}.Dockerfile", "dockerfiles"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(text)
+        written[key] += 1
+        written["lines"] += text.count("\n")
+
+    for i in range(ignored):
+        directory = os.path.join(root, f"svc{i % 97}", "node_modules" if i % 2 else ".git", f"pkg{i}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "Dockerfile"), "w", encoding="utf-8") as f:
+            f.write(dockerfile_text())
+        written["ignored"] += 1
+    return written
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process, or None where getrusage is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_benchmark(root: str, jobs: int = 1, executor: str = "process",
+                  render: Optional[Callable[[IssueStore], None]] = None) -> Dict[str, dict]:
+    """Times each pipeline stage on `root` with a fresh engine and no result cache.
+
+    `render` draws the first page of findings; the render stage is only timed if it is given.
+    """
+    bench = ScannerEngine()
+    stages: Dict[str, dict] = {}
+
+    def timed(name: str, fn):
+        started = time.perf_counter()
+        value = fn()
+        stages[name] = {"seconds": round(time.perf_counter() - started, 6)}
+        return value
+
+    timed("discovery", lambda: bench.spider_search(root))
+    files = bench.dockerfiles + bench.composefiles
+
+    def read_all():
+        total_lines = total_bytes = 0
+        for p in files:
+            with open(p, "rb") as f:
+                data = f.read()
+            total_bytes += len(data)
+            total_lines += data.count(b"\n")
+        return total_lines, total_bytes
+
+    total_lines, total_bytes = timed("read", read_all)
+    timed("analyze", lambda: bench.analyze_all(jobs=jobs, executor=executor))
+    order = timed("sort", bench.issues.severity_order)
+    if render is not None:
+        timed("render", lambda: render(bench.issues))
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timed("export", lambda: write_report(bench, os.path.join(tmp, "report.html"), "html"))
+
+    def rate(count: int, seconds: float) -> float:
+        return round(count / seconds, 1) if seconds > 0 else 0.0
+
+    stages["discovery"].update(dirs=bench.walk_stats["dirs"], files=len(files),
+                               dirs_per_sec=bench.walk_stats["dirs_per_sec"])
+    stages["read"].update(bytes=total_bytes, files_per_sec=rate(len(files), stages["read"]["seconds"]))
+    analyze = stages["analyze"]["seconds"]
+    stages["analyze"].update(files_per_sec=rate(len(files), analyze), lines_per_sec=rate(total_lines, analyze),
+                             issues_per_sec=rate(len(bench.issues), analyze))
+    stages["sort"].update(issues=len(order))
+    stages["export"].update(issues_per_sec=rate(len(bench.issues), stages["export"]["seconds"]))
+    return {
+        "corpus": {"files": len(files), "lines": total_lines, "bytes": total_bytes, "issues": len(bench.issues)},
+        "stages": stages,
+        "total_seconds": round(sum(st["seconds"] for st in stages.values()), 6),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# --- STREAM OUTPUT ---
+
+SARIF_LEVELS = {"CRITICAL": "error", "HIGH": "error", "MEDIUM": "warning", "LOW": "note", "INFO": "note"}
+
+
+def _rule_id(issue: Issue) -> str:
+    """Stable identifier for the check that produced an issue."""
+    return issue.rule_id or re.sub(r"[^a-z0-9]+", "-", issue.message.lower()).strip("-")
+
+
+class IssueStreamWriter:
+    """Writes issues to a stream as they are found, in json, ndjson or sarif."""
+
+    FORMATS = ("json", "ndjson", "sarif")
+
+    def __init__(self, fmt: str, out=None, rules: Optional[List[Rule]] = None):
+        self.fmt = fmt
+        self.out = out or sys.stdout
+        self.rules = rules or []
+        self.count = 0
+
+    def open(self):
+        if self.fmt == "json":
+            self.out.write('{"issues": [')
+        elif self.fmt == "sarif":
+            driver = {"name": "docker-detective", "informationUri": "https://github.com/AhmedDev374/Dockerfile-Health-Scanner",
+                      "rules": [{"id": r.id, "shortDescription": {"text": r.message}, "help": {"text": r.suggestion},
+                                 "defaultConfiguration": {"level": SARIF_LEVELS.get(r.severity, "note")},
+                                 "properties": {"severity": r.severity, "category": r.category}}
+                                for r in self.rules]}
+            self.out.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", "version": "2.1.0", '
+                           '"runs": [{"tool": {"driver": ' + json.dumps(driver) + '}, "results": [')
+
+    def write(self, issue: Issue, status: str = ""):
+        """Writes one finding; `status` ("new") is set when comparing against a baseline."""
+        if self.fmt == "sarif":
+            record = self._sarif_result(issue)
+            if status:
+                record["baselineState"] = status
+        else:
+            record = asdict(issue)
+            if status:
+                record["status"] = status
+        self._emit(record)
+
+    def _emit(self, record: dict):
+        if self.fmt == "ndjson":
+            self.out.write(json.dumps(record) + "\n")
+        else:
+            self.out.write(("," if self.count else "") + "\n" + json.dumps(record))
+        self.out.flush()
+        self.count += 1
+
+    def close(self, stats: Dict[str, int], score: int, fixed: Optional[List[dict]] = None):
+        """Ends the document. `fixed` lists baseline findings that are gone."""
+        if self.fmt == "ndjson":
+            for record in fixed or ():
+                self._emit(dict(record, status="fixed"))
+        elif self.fmt == "sarif":
+            for record in fixed or ():
+                self._emit({"ruleId": record["rule_id"], "level": SARIF_LEVELS.get(record["severity"], "note"),
+                            "message": {"text": f"Fixed since baseline ({record['count']}x)."},
+                            "locations": [{"physicalLocation": {"artifactLocation": {"uri": record["filepath"]}}}],
+                            "baselineState": "absent"})
+        if self.fmt == "json":
+            self.out.write('\n], ' + ('"fixed": ' + json.dumps(fixed) + ', ' if fixed is not None else '') +
+                           '"stats": ' + json.dumps(stats) + ', "score": ' + str(score) + '}\n')
+        elif self.fmt == "sarif":
+            self.out.write('\n]}]}\n')
+        self.out.flush()
+
+    @staticmethod
+    def _sarif_result(issue: Issue) -> dict:
+        location = {"artifactLocation": {"uri": Path(issue.filepath).as_posix()}}
+        if issue.line_num > 0:
+            location["region"] = {"startLine": issue.line_num}
+        return {
+            "ruleId": _rule_id(issue),
+            "level": SARIF_LEVELS.get(issue.severity, "note"),
+            "message": {"text": f"{issue.message} {issue.suggestion}"},
+            "locations": [{"physicalLocation": location}],
+            "properties": {"severity": issue.severity, "category": issue.category},
+        }
+
+
+def exceeds_threshold(stats: Dict[str, int], fail_on: str) -> bool:
+    """True if any finding is at or above the given severity."""
+    limit = SEVERITY_ORDER[fail_on]
+    return any(stats.get(sev.lower(), 0) for sev, rank in SEVERITY_ORDER.items() if rank <= limit)
+
+
+# --- SHARDED RUNS ---
+
+PARTIAL_FORMAT = 1
+
+
+def parse_shard(spec: str):
+    """'i/N' (1 <= i <= N) -> (i, N)."""
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+    if not match or not 1 <= int(match[1]) <= int(match[2]):
+        raise ValueError(f"'{spec}' is not a shard i/N with 1 <= i <= N")
+    return int(match[1]), int(match[2])
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """Shard (1..count) that owns a root-relative path; the same on every machine and Python run."""
+    digest = hashlib.sha1(rel_path.replace(os.sep, "/").encode("utf-8", "surrogateescape")).digest()
+    return int.from_bytes(digest[:8], "big") % count + 1
+
+
+def _partial_key(record: list):
+    # total order over every field, so merged output does not depend on which shard came first
+    return (SEVERITY_ORDER.get(record[0], 99), record[2], record[3], record[7], record[4], record[5],
+            record[1], record[6])
+
+
+def _open_partial(path, mode: str, gz: Optional[bool] = None):
+    if str(path).endswith(".gz") if gz is None else gz:
+        import gzip
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="\n")
+    return open(path, mode, encoding="utf-8", newline="\n")
+
+
+def write_partial(scan: "ScannerEngine", path, shard=(1, 1)):
+    """Writes a mergeable partial result (JSON lines, gzipped if `path` ends in .gz).
+
+    The first line describes the run (format, rule set version, shard, stats, files not
+    analyzed); every following line is one issue as a compact array with a root-relative
+    path, in the order merge() consumes them.
+    """
+    rel = scan.issues.rel
+    records = sorted(([i.severity, i.category, rel(i.filepath).replace(os.sep, "/"), i.line_num, i.content,
+                       i.message, i.suggestion, i.rule_id] for i in scan.issues), key=_partial_key)
+    header = {"partial": PARTIAL_FORMAT, "ruleset": scan.rules.version, "shard": list(shard),
+              "stats": scan.stats,
+              "skipped": sorted([rel(p).replace(os.sep, "/"), f.reason, f.detail] for p, f in scan.skipped.items())}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with _open_partial(tmp, "w", gz=str(path).endswith(".gz")) as f:
+        f.write(json.dumps(header, separators=(",", ":")) + "\n")
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    os.replace(tmp, path)
+
+
+class PartialMerge:
+    """Combines partial results (see write_partial) from any number of shards.
+
+    Headers are read up front (stats, score and skipped files are known before the first
+    issue), then issues() streams a k-way merge of the already sorted partials, holding one
+    issue per partial in memory. The result does not depend on the order of `paths`.
+    """
+
+    def __init__(self, paths):
+        self.paths = [str(p) for p in paths]
+        self.ruleset = None
+        self.count = None
+        self.shards: Dict[int, str] = {}
+        self.stats: Dict[str, int] = {}
+        self.skipped: List[list] = []
+        self._files = []
+        try:
+            for path in self.paths:
+                f = _open_partial(path, "r")
+                self._files.append(f)
+                self._add_header(path, f.readline())
+        except BaseException:
+            self.close()
+            raise
+        self.skipped.sort()
+
+    def _add_header(self, path: str, line: str):
+        try:
+            header = json.loads(line)
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or header.get("partial") != PARTIAL_FORMAT:
+            raise ValueError(f"{path}: not a partial result")
+        index, count = header["shard"]
+        if self.ruleset is None:
+            self.ruleset, self.count = header["ruleset"], count
+        elif header["ruleset"] != self.ruleset:
+            raise ValueError(f"{path}: rule set {header['ruleset']} does not match {self.ruleset}")
+        elif count != self.count:
+            raise ValueError(f"{path}: shard {index}/{count} is from a {count}-way split, not {self.count}")
+        if index in self.shards:
+            raise ValueError(f"{path}: shard {index}/{count} is already in {self.shards[index]}")
+        self.shards[index] = path
+        for name, value in header["stats"].items():
+            self.stats[name] = self.stats.get(name, 0) + value
+        self.skipped.extend(header["skipped"])
+
+    @property
+    def missing(self) -> List[int]:
+        """Shards of the split that were not given."""
+        return [i for i in range(1, (self.count or 0) + 1) if i not in self.shards]
+
+    def score(self) -> int:
+        return health_score(self.stats)
+
+    def issues(self):
+        """Yields the merged issues, severity first (the order of write_report)."""
+        streams = [map(json.loads, f) for f in self._files]
+        for record in heapq.merge(*streams, key=_partial_key):
+            yield Issue(*record)
+
+    def close(self):
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- PRE-COMMIT CHECK ---
+
+def check(paths: List[str], fmt: str = "text", fail_on: str = "HIGH", rules: Optional[RuleSet] = None,
+          max_file_size: int = DEFAULT_MAX_FILE_SIZE, out=None) -> int:
+    """Scans the given files and returns the exit code: 1 if anything is at or above fail_on."""
+    out = out or sys.stdout
+    scan = ScannerEngine(rules)
+    scan.max_file_size = max_file_size
+    if fmt == "text":
+        scan.on_issue = lambda issue: out.write(
+            f"{issue.filepath}:{issue.line_num}: {issue.severity} {_rule_id(issue)} {issue.message} {issue.suggestion}\n")
+        scan.scan_paths(paths)
+    else:
+        writer = IssueStreamWriter(fmt, out, scan.rules.rules)
+        scan.on_issue = writer.write
+        writer.open()
+        scan.scan_paths(paths)
+        writer.close(scan.stats, scan.score())
+    for path, failure in scan.skipped.items():
+        detail = f" ({failure.detail})" if failure.detail else ""
+        sys.stderr.write(f"not analyzed: {path}: {failure.reason}{detail}\n")
+    return 1 if fail_on != "NONE" and exceeds_threshold(scan.stats, fail_on) else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="docker-detective check",
+                                     description="Fast check of individual Dockerfiles / compose files "
+                                                 "(for pre-commit hooks).")
+    parser.add_argument("files", nargs="+", help="Files to check; *.yml / *.yaml are read as compose files.")
+    parser.add_argument("-f", "--format", dest="fmt", default="text", choices=("text",) + IssueStreamWriter.FORMATS)
+    parser.add_argument("--fail-on", default="HIGH", type=str.upper, choices=list(SEVERITY_ORDER)[:4] + ["NONE"],
+                        help="Exit 1 if any finding is at or above this severity (default: HIGH).")
+    parser.add_argument("--rules", help="JSON file with additional custom rules.")
+    parser.add_argument("--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE,
+                        help="Skip files larger than this many bytes (0 = no limit).")
+    args = parser.parse_args(argv)
+    rules = RuleSet()
+    if args.rules:
+        try:
+            rules.load(args.rules)
+        except (OSError, ValueError, TypeError) as e:
+            parser.error(f"--rules: {e}")
+    return check(args.files, args.fmt, args.fail_on, rules, args.max_file_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+"""`serve`: a long-lived scanning daemon with a small JSON API over HTTP or a Unix socket.
+
+    GET  /healthz          liveness and rule set version
+    GET  /metrics          request latency (per endpoint) and cache hit counters
+    POST /scan             {"path": "/abs/dir", "exclude": [...]}
+    POST /scan/content     {"content": "...", "kind": "dockerfile" | "compose", "name": "Dockerfile"}
+
+Every request gets its own ScannerEngine, but they all share one compiled RuleSet and one
+ResultCache, so a warm server only re-analyzes files that changed since they were last seen.
+"""
+import collections
+import hashlib
+import http.client
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from scanner import (
+    DEFAULT_EXCLUDES, DEFAULT_MAX_FILE_SIZE, SEVERITY_ORDER, ResultCache, RuleSet, ScannerEngine, SpiderWalker,
+)
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class ServiceMetrics:
+    """Request counters and latency percentiles over the last `window` requests per endpoint."""
+
+    def __init__(self, window: int = 1024):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.window = window
+        self.requests = collections.Counter()
+        self.errors = collections.Counter()
+        self.latency: Dict[str, collections.deque] = {}
+        self.in_flight = 0
+        self.cache = {"file_hits": 0, "file_misses": 0, "content_hits": 0, "content_misses": 0}
+
+    def begin(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def observe(self, endpoint: str, seconds: float, ok: bool):
+        with self.lock:
+            self.in_flight -= 1
+            self.requests[endpoint] += 1
+            if not ok:
+                self.errors[endpoint] += 1
+            self.latency.setdefault(endpoint, collections.deque(maxlen=self.window)).append(seconds)
+
+    def count(self, **counters: int):
+        with self.lock:
+            for name, value in counters.items():
+                self.cache[name] += value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            endpoints = {}
+            for endpoint, samples in self.latency.items():
+                ordered = sorted(samples)
+
+                def pct(p: float) -> float:
+                    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+                endpoints[endpoint] = {
+                    "requests": self.requests[endpoint],
+                    "errors": self.errors[endpoint],
+                    "latency_ms": {"mean": round(sum(ordered) / len(ordered) * 1000, 3), "p50": pct(0.5),
+                                   "p95": pct(0.95), "p99": pct(0.99), "max": round(ordered[-1] * 1000, 3)},
+                }
+            cache = dict(self.cache)
+            in_flight = self.in_flight
+        for kind in ("file", "content"):
+            total = cache[f"{kind}_hits"] + cache[f"{kind}_misses"]
+            cache[f"{kind}_hit_ratio"] = round(cache[f"{kind}_hits"] / total, 4) if total else None
+        return {"uptime_seconds": round(time.time() - self.started, 1), "in_flight": in_flight,
+                "endpoints": endpoints, "cache": cache}
+
+
+class ScanService:
+    """The warm state behind `serve`; its methods are called concurrently from request threads."""
+
+    def __init__(self, rules: RuleSet, cache: Optional[ResultCache], allow: List[str], jobs: int = 1,
+                 max_file_size: int = DEFAULT_MAX_FILE_SIZE, content_cache_size: int = 4096):
+        self.rules = rules
+        self.cache = cache
+        self.allow = [os.path.realpath(p) for p in allow]
+        self.jobs = jobs
+        self.max_file_size = max_file_size
+        self.metrics = ServiceMetrics()
+        self.content_cache_size = content_cache_size
+        self.content_results: "collections.OrderedDict[str, dict]" = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def _engine(self, root: str = ".") -> ScannerEngine:
+        scan = ScannerEngine(self.rules)
+        scan.root_path = Path(root)
+        scan.reset()
+        scan.cache = self.cache
+        scan.max_file_size = self.max_file_size
+        return scan
+
+    @staticmethod
+    def _result(scan: ScannerEngine) -> dict:
+        return {
+            "issues": [asdict(issue) for issue in scan.issues],
+            "stats": dict(scan.stats),
+            "score": scan.score(),
+            "skipped": {path: failure.reason for path, failure in scan.skipped.items()},
+        }
+
+    def scan_path(self, path: str, exclude: List[str] = ()) -> dict:
+        real = os.path.realpath(path)
+        if not any(real == root or real.startswith(root.rstrip(os.sep) + os.sep) for root in self.allow):
+            raise PermissionError(f"'{path}' is outside the served roots")
+        if not os.path.isdir(real):
+            raise FileNotFoundError(f"'{path}' is not a directory")
+        scan = self._engine(real)
+        scan.spider_search(real, SpiderWalker(excludes=DEFAULT_EXCLUDES + tuple(exclude)))
+        scan.analyze_all(jobs=self.jobs, executor="thread")
+        self.metrics.count(file_hits=scan.stats["cache_hits"], file_misses=scan.stats["cache_misses"])
+        return dict(self._result(scan), root=real)
+
+    def scan_content(self, content: str, kind: str = "dockerfile", name: str = "") -> dict:
+        if kind not in ("dockerfile", "compose"):
+            raise ValueError("kind must be dockerfile or compose")
+        name = name or ("docker-compose.yml" if kind == "compose" else "Dockerfile")
+        key = hashlib.sha1(f"{kind}\0{name}\0{content}".encode("utf-8", "surrogatepass")).hexdigest()
+        with self.lock:
+            result = self.content_results.get(key)
+            if result is not None:
+                self.content_results.move_to_end(key)
+        if result is not None:
+            self.metrics.count(content_hits=1)
+            return result
+
+        scan = self._engine()
+        scan.scan_text(kind, name, content)
+        result = self._result(scan)
+        self.metrics.count(content_misses=1)
+        with self.lock:
+            self.content_results[key] = result
+            while len(self.content_results) > self.content_cache_size:
+                self.content_results.popitem(last=False)
+        return result
+
+    def health(self) -> dict:
+        return {"status": "ok", "rules": self.rules.version, "severities": list(SEVERITY_ORDER)}
+
+    def close(self):
+        if self.cache:
+            self.cache.save(force=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "docker-detective"
+    protocol_version = "HTTP/1.1"
+    max_body = 8 * DEFAULT_MAX_FILE_SIZE
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            sys.stderr.write(f"{self.address_string()} {fmt % args}\n")
+
+    def do_GET(self):
+        routes = {"/healthz": self.server.service.health, "/metrics": self.server.service.metrics.snapshot}
+        self._dispatch(routes, lambda handler: handler())
+
+    def do_POST(self):
+        service = self.server.service
+        routes = {
+            "/scan": lambda body: service.scan_path(body["path"], body.get("exclude", [])),
+            "/scan/content": lambda body: service.scan_content(body["content"], body.get("kind", "dockerfile"),
+                                                               body.get("name", "")),
+        }
+        self._dispatch(routes, lambda handler: handler(self._body()))
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > self.max_body:
+            raise OverflowError(f"request body larger than {self.max_body} bytes")
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("request body must be a JSON object")
+        return body
+
+    def _dispatch(self, routes: dict, call):
+        endpoint = urlsplit(self.path).path
+        handler = routes.get(endpoint)
+        metrics = self.server.service.metrics
+        started = time.perf_counter()
+        metrics.begin()
+        status = 200
+        try:
+            if handler is None:
+                status, payload = 404, {"error": f"no such endpoint: {self.command} {endpoint}"}
+            else:
+                payload = call(handler)
+        except PermissionError as e:
+            status, payload = 403, {"error": str(e)}
+        except FileNotFoundError as e:
+            status, payload = 404, {"error": str(e)}
+        except OverflowError as e:
+            status, payload = 413, {"error": str(e)}
+        except (KeyError, TypeError, ValueError) as e:
+            status, payload = 400, {"error": f"bad request: {e}"}
+        except Exception as e:
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        metrics.observe(endpoint if handler is not None else "(unknown)", time.perf_counter() - started, status < 400)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service: ScanService, host: str = "127.0.0.1", port: int = 8765,
+                socket_path: Optional[str] = None, verbose: bool = False):
+    """A threading HTTP server (one thread per connection) bound to host:port or to a Unix socket."""
+    if socket_path:
+        try:
+            if stat.S_ISSOCK(os.stat(socket_path).st_mode):
+                os.unlink(socket_path)  # left over from a previous run
+        except FileNotFoundError:
+            pass
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class ServiceClient:
+    """Minimal client for a running `serve` (stands in for the portal / hooks in tests)."""
+
+    def __init__(self, url: str = DEFAULT_URL, socket_path: Optional[str] = None, timeout: float = 300.0):
+        self.url = urlsplit(url)
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, self.timeout)
+        return http.client.HTTPConnection(self.url.hostname or "127.0.0.1", self.url.port or 8765,
+                                          timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: Optional[dict] = None):
+        """Returns (HTTP status, decoded JSON payload)."""
+        conn = self._connection()
+        try:
+            data = json.dumps(body).encode("utf-8") if body is not None else None
+            conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+
+    def scan(self, path: str, exclude: List[str] = ()):
+        return self.request("POST", "/scan", {"path": os.path.abspath(path), "exclude": list(exclude)})
+
+    def scan_content(self, content: str, kind: str = "dockerfile", name: str = ""):
+        return self.request("POST", "/scan/content", {"content": content, "kind": kind, "name": name})
+
+    def metrics(self):
+        return self.request("GET", "/metrics")
+
+    def health(self):
+        return self.request("GET", "/healthz")
@@ -0,0 +1,482 @@
+"""Interactive console (The Architect's Console). Imported only when no command is given."""
+import datetime
+import os
+import sqlite3
+import sys
+import time
+import random
+import webbrowser
+from pathlib import Path
+from typing import Optional
+from rich.console import Console
+from rich.table import Table
+from rich.panel import Panel
+from rich.text import Text
+from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
+from rich.tree import Tree
+from rich.syntax import Syntax
+from rich.prompt import Prompt, IntPrompt
+from rich import print as rprint
+from scanner import (
+    GRAPH_INHERIT, ProjectGraph, ScannerEngine, IssueStore, apply_fix, plan_fixes, reanalyze_fixed, report_format,
+    unified_diff, write_report,
+)
+from history import HistoryStore, trend_html
+
+if os.name == 'nt':
+    os.system('chcp 65001 >nul')
+    os.system("")
+
+# --- FIX: SMART ICON DETECTION SYSTEM ---
+# This detects if the terminal supports emojis. If not (standard .exe), it uses safe text.
+def is_modern_terminal():
+    # Check for Windows Terminal, VS Code, or PyCharm environments
+    if "WT_SESSION" in os.environ: return True
+    if os.environ.get("TERM_PROGRAM") in ["vscode", "Apple_Terminal"]: return True
+    if "PYCHARM_HOSTED" in os.environ: return True
+    return False
+
+# Setup Console based on environment
+if is_modern_terminal():
+    console = Console(force_terminal=True)
+    # Modern Emojis
+    ICON_SPIDER = "🕷️"
+    ICON_SCOPE = "🔬"
+    ICON_MAP = "🗺️"
+    ICON_FIX = "🔧"
+    ICON_CHART = "📊"
+    ICON_WHALE = "🐳"
+    ICON_OCTOPUS = "🐙"
+    ICON_PACKAGE = "📦"
+    ICON_SHIELD = "🛡️"
+    ICON_CHECK = "✔"
+    ICON_CROSS = "❌"
+else:
+    # Legacy Safe Mode (Fixes the "Square Box" issue in .exe)
+    console = Console(force_terminal=True, legacy_windows=True)
+    ICON_SPIDER = "[SCAN]"
+    ICON_SCOPE = "[ANALYZE]"
+    ICON_MAP = "[MAP]"
+    ICON_FIX = "[FIX]"
+    ICON_CHART = "[REPORT]"
+    ICON_WHALE = "[DOCKER]"
+    ICON_OCTOPUS = "[COMPOSE]"
+    ICON_PACKAGE = "[SVC]"
+    ICON_SHIELD = "[SECURITY]"
+    ICON_CHECK = "[OK]"
+    ICON_CROSS = "[ERROR]"
+
+BANNER = """
+[bold cyan]
+██████╗  ██████╗  ██████╗██╗  ██╗███████╗██████╗ 
+██╔══██╗██╔═══██╗██╔════╝██║ ██╔╝██╔════╝██╔══██╗
+██║  ██║██║   ██║██║     █████╔╝ █████╗  ██████╔╝
+██║  ██║██║   ██║██║     ██╔═██╗ ██╔══╝  ██╔══██╗
+██████╔╝╚██████╔╝╚██████╗██║  ██╗███████╗██║  ██║
+╚═════╝  ╚═════╝  ╚═════╝╚═╝  ╚═╝╚══════╝╚═╝  ╚═╝
+[/bold cyan][bold white]       THE ARCHITECT'S CONSOLE v3.2 (FIXED EDITION)
+       "Because Security is not a Feature, it's a State."
+[/bold white]"""
+
+
+# --- UI COMPONENTS ---
+
+engine = ScannerEngine()
+history_db: Optional[Path] = None  # scan history to record into; None = off (opt in with `main.py --history`)
+
+
+def print_banner():
+    if os.name == 'nt':
+        os.system('cls')
+    else:
+        console.clear()
+
+    console.print(BANNER)
+    console.print(Text("  Ahmed Atef Elnadi | DevOps Solution Architect | GitHub: AhmedDev374", style="dim white",
+                       justify="center"))
+    console.print(Text("-" * 80, style="dim blue", justify="center"))
+
+
+def loading_animation(task_name):
+    with Progress(
+            SpinnerColumn("aesthetic"),
+            TextColumn("[bold green]{task.description}"),
+            BarColumn(bar_width=None),
+            transient=True
+    ) as progress:
+        task = progress.add_task(task_name, total=100)
+        while not progress.finished:
+            progress.update(task, advance=random.uniform(1, 5))
+            time.sleep(0.02)
+
+
+def module_spider_scan():
+    print_banner()
+    path_input = Prompt.ask("[bold yellow][?] Enter root path to scan[/bold yellow]", default=".")
+
+    loading_animation(f"Spidering directory: {path_input}")
+    engine.spider_search(path_input)
+
+    tree = Tree(f"📁 [bold]{Path(path_input).resolve().name}[/bold]")
+
+    # Visualizing the found files
+    for d in engine.dockerfiles:
+        tree.add(f"{ICON_WHALE} [cyan]{d.relative_to(path_input)}[/cyan]")
+    for c in engine.composefiles:
+        tree.add(f"{ICON_OCTOPUS} [magenta]{c.relative_to(path_input)}[/magenta]")
+
+    console.print(Panel(tree, title="[bold]Reconnaissance Results[/bold]", border_style="blue"))
+    rprint(
+        f"[bold green]Found {len(engine.dockerfiles)} Dockerfiles and {len(engine.composefiles)} Compose files.[/bold green]")
+    walk = engine.walk_stats
+    rprint(f"[dim]Crawled {walk['dirs']} dirs / {walk['files']} entries in {walk['seconds']:.3f}s "
+           f"({walk['dirs_per_sec']:.0f} dirs/s, {walk['files_per_sec']:.0f} files/s)[/dim]")
+    if walk["errors"]:
+        rprint("[red]Permission Denied: Could not access some folders.[/red]")
+    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+
+
+PAGE_SIZE_MIN = 10
+PAGER_HELP = ("[dim][bold]Enter/n[/bold] next  [bold]p[/bold] prev  [bold]g/G[/bold] first/last  "
+              "[bold]c/h/m/l[/bold] jump to severity  [bold]f <text>[/bold] filter file  "
+              "[bold]k <cat>[/bold] filter category  [bold]x[/bold] clear filters  [bold]q[/bold] back[/dim]")
+
+
+class IssuePager:
+    """Windowed view over an issue list.
+
+    Holds only integer indexes into the IssueStore (taken from its severity index, so no
+    sort and no copies of the issues themselves) and builds a Rich table for the visible page only, so the
+    first page renders instantly regardless of how many findings there are.
+    """
+
+    JUMPS = {"c": "CRITICAL", "h": "HIGH", "m": "MEDIUM", "l": "LOW"}
+
+    def __init__(self, issues: IssueStore, page_size: int):
+        self.issues = issues
+        self.rel = issues.rel
+        self.page_size = page_size
+        self.order = issues.severity_order()
+        self.view = self.order
+        self.pos = 0
+        self.file_filter = ""
+        self.category_filter = ""
+
+    def _apply_filters(self):
+        file_filter, category_filter = self.file_filter.lower(), self.category_filter.upper()
+        if not file_filter and not category_filter:
+            self.view = self.order
+        else:
+            issues = self.issues
+            self.view = [idx for idx in self.order
+                         if (not file_filter or file_filter in issues[idx].filepath.lower())
+                         and (not category_filter or issues[idx].category.startswith(category_filter))]
+        self.pos = 0
+
+    def handle(self, command: str) -> bool:
+        """Applies one navigation command. Returns False when the viewer should close."""
+        command = command.strip()
+        key, _, arg = command.partition(" ")
+        last_page = max(0, (len(self.view) - 1) // self.page_size * self.page_size)
+        if key in ("q", "quit", "exit"):
+            return False
+        if key in ("", "n"):
+            self.pos = min(self.pos + self.page_size, last_page)
+        elif key == "p":
+            self.pos = max(0, self.pos - self.page_size)
+        elif key == "g":
+            self.pos = 0
+        elif key == "G":
+            self.pos = last_page
+        elif key.lower() in self.JUMPS:
+            severity = self.JUMPS[key.lower()]
+            first = next((n for n, idx in enumerate(self.view) if self.issues[idx].severity == severity), None)
+            if first is not None:
+                self.pos = first
+        elif key == "f":
+            self.file_filter = arg.strip()
+            self._apply_filters()
+        elif key == "k":
+            self.category_filter = arg.strip()
+            self._apply_filters()
+        elif key == "x":
+            self.file_filter = self.category_filter = ""
+            self._apply_filters()
+        return True
+
+    def render(self) -> Table:
+        total = len(self.view)
+        end = min(self.pos + self.page_size, total)
+        filters = " ".join(f for f in (self.file_filter and f"file~{self.file_filter}",
+                                         self.category_filter and f"category={self.category_filter}") if f)
+        caption = f"Rows {self.pos + 1 if total else 0}-{end} of {total}" + (f"  [{filters}]" if filters else "")
+
+        table = Table(title=f"{ICON_SHIELD} VULNERABILITY REPORT", caption=caption, expand=True,
+                      header_style="bold black on white")
+        table.add_column("Sev", style="bold", width=8)
+        table.add_column("File", style="dim", width=25)
+        table.add_column("Issue Detected", style="white")
+        table.add_column("Expert Solution", style="green")
+
+        for idx in self.view[self.pos:end]:
+            issue = self.issues[idx]
+            color = "red" if issue.severity == "CRITICAL" else "yellow" if issue.severity == "HIGH" else "blue"
+            table.add_row(
+                f"[{color}]{issue.severity}[/{color}]",
+                f"{self.rel(issue.filepath)}:{issue.line_num}",
+                issue.message,
+                issue.suggestion
+            )
+        return table
+
+
+def _record_history():
+    """Keeps this analysis in the scan history (if enabled); returns the previous scan of the same root, if any."""
+    if history_db is None:
+        return None
+    try:
+        with HistoryStore(history_db) as store:
+            previous = store.rollup(store.root_of(engine))
+            store.record(engine)
+            return previous
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def module_deep_analysis():
+    if engine.stats["files_scanned"] == 0 and not engine.dockerfiles and not engine.composefiles:
+        rprint(f"[bold red]{ICON_CROSS} No files loaded! Run the Spider Scan (Option 1) first.[/bold red]")
+        time.sleep(2)
+        return
+
+    print_banner()
+    loading_animation("Running Heuristic Analysis & Forensics Engine...")
+    engine.analyze_all()
+    previous = _record_history()
+
+    # Scorecard
+    score = engine.score()
+
+    stats_panel = Panel(
+        f"""
+        [bold red]CRITICAL: {engine.stats['critical']}[/]   [bold yellow]HIGH: {engine.stats['high']}[/]   [bold blue]MEDIUM: {engine.stats['medium']}[/]
+
+        [bold white on blue]  FINAL SYSTEM SCORE: {score}/100  [/]
+        """ + (f"""
+        [dim]Not analyzed: {engine.stats['skipped']} skipped (too large / binary), {engine.stats['unreadable']} unreadable / unparsable[/]
+        """ if engine.skipped else "") + (f"""
+        [dim]Previous scan ({datetime.datetime.fromtimestamp(previous['started']):%Y-%m-%d %H:%M}): {previous['score']}/100 ({score - previous['score']:+d})[/]
+        """ if previous else ""),
+        title="Session Statistics", border_style="white"
+    )
+
+    if len(engine.issues) <= PAGE_SIZE_MIN:
+        console.print(IssuePager(engine.issues, PAGE_SIZE_MIN).render())
+        console.print(stats_panel)
+        Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+        return
+
+    pager = IssuePager(engine.issues, max(PAGE_SIZE_MIN, console.size.height - 22))
+    while True:
+        console.clear()
+        console.print(stats_panel)
+        console.print(pager.render())
+        rprint(PAGER_HELP)
+        command = Prompt.ask("[bold yellow]view>[/bold yellow]", default="n", show_default=False)
+        if not pager.handle(command):
+            return
+
+
+FIX_TABLE_ROWS = 20
+FIX_PREVIEW_LINES = 60
+
+
+def module_fixer_preview():
+    print_banner()
+    rprint(f"[bold yellow]{ICON_FIX} AUTO-FIX PREVIEW MODULE[/bold yellow]")
+
+    if not engine.issues:
+        rprint("[dim]No issues to fix. Run analysis first.[/dim]")
+        time.sleep(2)
+        return
+
+    fixes = [change for change in plan_fixes(engine) if change.applied]
+    if not fixes:
+        rprint("[dim]None of the current findings has an automatic fix; see the suggestions in the report.[/dim]")
+        Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+        return
+
+    table = Table(title=f"{sum(len(c.applied) for c in fixes)} fixes in {len(fixes)} files", header_style="bold magenta")
+    table.add_column("File", style="cyan")
+    table.add_column("Fixes", justify="right")
+    table.add_column("Rules")
+    for change in fixes[:FIX_TABLE_ROWS]:
+        table.add_row(engine.issues.rel(change.filepath), str(len(change.applied)),
+                      ", ".join(sorted({i.rule_id for i in change.applied})))
+    if len(fixes) > FIX_TABLE_ROWS:
+        table.add_row(f"[dim]... {len(fixes) - FIX_TABLE_ROWS} more files[/dim]", "", "")
+    console.print(table)
+
+    patch = "".join(unified_diff(change, engine.issues.rel(change.filepath)) for change in fixes)
+    lines = patch.splitlines()
+    console.print(Syntax("\n".join(lines[:FIX_PREVIEW_LINES]), "diff", theme="monokai"))
+    if len(lines) > FIX_PREVIEW_LINES:
+        rprint(f"[dim]... {len(lines) - FIX_PREVIEW_LINES} more patch lines (save the patch to see them all)[/dim]")
+
+    action = Prompt.ask("\n[bold yellow][s] Save patch  [a] Apply to files  [Enter] Return[/bold yellow]",
+                        choices=["s", "a", ""], default="", show_choices=False, show_default=False)
+    if action == "s":
+        output = Prompt.ask("[bold yellow][?] Patch file[/bold yellow]", default="fixes.patch")
+        try:
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                f.write(patch)
+        except OSError as e:
+            rprint(f"[bold red]{ICON_CROSS} Could not write {output}: {e}[/bold red]")
+        else:
+            rprint(f"[bold green]{ICON_CHECK} Patch saved: {output} (apply with 'git apply {output}')[/bold green]")
+    elif action == "a":
+        written = remaining = 0
+        for change in fixes:
+            if apply_fix(change):
+                written += 1
+                remaining += len(reanalyze_fixed(engine, change))
+            else:
+                rprint(f"[yellow]Skipped {engine.issues.rel(change.filepath)}: changed since it was read.[/yellow]")
+        rprint(f"[bold green]{ICON_CHECK} {written} files rewritten; "
+               f"{'all fixes confirmed by re-analysis' if not remaining else f'{remaining} findings still reported'}."
+               f" New score: {engine.score()}/100[/bold green]")
+    else:
+        return
+    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+
+
+def _chain(graph: ProjectGraph, node_id: str) -> str:
+    """`api/Dockerfile -> mycorp/base:1.0 -> base/Dockerfile -> debian:12` along build/from edges."""
+    parts, seen = [], set()
+    while node_id and node_id not in seen:
+        seen.add(node_id)
+        parts.append(graph.nodes[node_id].label)
+        node_id = next((dst for dst, kind in graph.out.get(node_id, ()) if kind in GRAPH_INHERIT), None)
+    return " -> ".join(parts[1:])
+
+
+def module_topology_map():
+    print_banner()
+    rprint(f"[bold cyan]{ICON_MAP}  INFRASTRUCTURE TOPOLOGY MAP[/bold cyan]")
+
+    if not engine.composefiles:
+        rprint("[dim]No compose files found. Cannot map topology.[/dim]")
+        time.sleep(2)
+        return
+
+    if not engine.scanned and not engine.skipped:
+        engine.analyze_all()  # the graph's FROM edges and findings come from the analysis
+    graph = ProjectGraph.build(engine)
+    for cf in engine.composefiles:
+        tree = Tree(f"{ICON_OCTOPUS} [bold magenta]{cf.name}[/bold magenta] [dim]{cf.parent}[/dim]")
+        model = engine.compose_model(cf)
+        if model is None or model.error:
+            tree.add(f"[red]{ICON_CROSS} {model.error if model else 'Unreadable file'}[/red]")
+        else:
+            project = engine.issues.rel(str(cf))
+            for svc in model.services:
+                svc_id = f"service:{project}#{svc.name}"
+                origin = svc.image or (f"build: {svc.build}" if svc.build else "")
+                service_node = tree.add(f"{ICON_PACKAGE} [bold green]{svc.name}[/bold green] [dim]{origin}[/dim]")
+                chain = _chain(graph, svc_id)
+                if chain:
+                    service_node.add(f"[white]image chain:[/white] {chain}")
+                inherited = graph.inherited(svc_id)
+                if inherited:
+                    counts = ProjectGraph.severity_counts(issue for _, issue in inherited)
+                    service_node.add("[red]inherited findings:[/red] " +
+                                     ", ".join(f"{count} {sev}" for sev, count in counts.items()))
+                if svc.privileged:
+                    service_node.add("[bold red]privileged[/bold red]")
+                if svc.depends_on:
+                    service_node.add(f"[cyan]depends on:[/cyan] {', '.join(svc.depends_on)}")
+                if svc.ports:
+                    service_node.add(f"[yellow]ports:[/yellow] {', '.join(svc.ports)}")
+                for dst, kind in graph.out.get(svc_id, ()):
+                    if kind not in ("network", "volume"):
+                        continue
+                    peers = [graph.nodes[src].label for src, _ in graph.into.get(dst, ()) if src != svc_id]
+                    shared = f" [dim](shared with {', '.join(peers)})[/dim]" if peers else ""
+                    color = "blue" if kind == "network" else "magenta"
+                    service_node.add(f"[{color}]{kind}:[/{color}] {graph.nodes[dst].label}{shared}")
+        console.print(tree)
+        console.print("")
+
+    Prompt.ask("\n[dim]Press Enter to return to menu...[/dim]")
+
+
+def module_export():
+    if not engine.issues and engine.stats["files_scanned"] == 0:
+        rprint("[red]No data to export. Run a scan first.[/red]")
+        time.sleep(1.5)
+        return
+
+    output = Prompt.ask("[bold yellow][?] Output file (.html, .jsonl or .csv)[/bold yellow]", default="audit_report.html")
+    fmt = report_format(output)
+    rprint(f"[bold yellow]Generating {fmt.upper()} Report...[/bold yellow]")
+
+    trends = ""
+    if fmt == "html" and history_db is not None:
+        try:
+            with HistoryStore(history_db) as store:
+                trends = trend_html(store, store.root_of(engine))
+        except (sqlite3.Error, OSError):
+            pass
+    try:
+        write_report(engine, output, fmt, trends=trends)
+    except OSError as e:
+        rprint(f"[bold red]{ICON_CROSS} Could not write {output}: {e}[/bold red]")
+        Prompt.ask("\n[dim]Press Enter to return...[/dim]")
+        return
+
+    rprint(f"[bold green]{ICON_CHECK} Report exported successfully: {output}[/bold green]")
+    if fmt == "html":
+        webbrowser.open("file://" + os.path.realpath(output))
+    Prompt.ask("\n[dim]Press Enter to return...[/dim]")
+
+
+# --- MAIN MENU LOOP ---
+
+def main_menu(history: Optional[Path] = None):
+    """Runs the interactive console; with `history`, Deep Analysis runs are recorded in that database."""
+    global history_db
+    history_db = history
+    while True:
+        print_banner()
+
+        menu_text = f"""
+    [bold white]SELECT A MODULE:[/bold white]
+
+    [bold cyan][1][/bold cyan] {ICON_SPIDER}  Spider Scan (Discover Files)    [dim]Recursive directory crawler[/dim]
+    [bold cyan][2][/bold cyan] {ICON_SCOPE}  Deep Analysis (The Detective)   [dim]Security & Logic forensics[/dim]
+    [bold cyan][3][/bold cyan] {ICON_MAP}  Topology Mapper                 [dim]Visual service graph[/dim]
+    [bold cyan][4][/bold cyan] {ICON_FIX}  Auto-Fix Preview                [dim]Generate patch suggestions[/dim]
+    [bold cyan][5][/bold cyan] {ICON_CHART}  Export Report                   [dim]Generate HTML Dashboard[/dim]
+
+    [bold red][99] Exit Console[/bold red]
+        """
+        console.print(Panel(menu_text, border_style="blue", title="Main Operations"))
+
+        choice = IntPrompt.ask("[bold yellow]root@docker-detective:~#[/bold yellow]",
+                               choices=["1", "2", "3", "4", "5", "99"])
+
+        if choice == 1:
+            module_spider_scan()
+        elif choice == 2:
+            module_deep_analysis()
+        elif choice == 3:
+            module_topology_map()
+        elif choice == 4:
+            module_fixer_preview()
+        elif choice == 5:
+            module_export()
+        elif choice == 99:
+            rprint("[bold red]Exiting... Stay Secure.[/bold red]")
+            sys.exit()
+
+